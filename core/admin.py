@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Course, AttendanceSession, AttendanceRecord
+from .models import User, Course, AttendanceSession, AttendanceRecord, DailyAttendance, Campus, Building
 
 # Define how the User should look in Admin
 class CustomUserAdmin(UserAdmin):
@@ -18,4 +18,7 @@ class CustomUserAdmin(UserAdmin):
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(Course)
 admin.site.register(AttendanceSession)
-admin.site.register(AttendanceRecord)
\ No newline at end of file
+admin.site.register(AttendanceRecord)
+admin.site.register(DailyAttendance)
+admin.site.register(Campus)
+admin.site.register(Building)
@@ -0,0 +1,325 @@
+# core/ann.py
+"""
+Approximate nearest-neighbour search over every enrolled face on campus.
+
+IVFIndex is an inverted-file index in plain NumPy: k-means splits the
+embeddings into `n_lists` cells, and a query only scans the `n_probe` cells
+whose centroids are closest to it. It is saved to FACE_ANN_INDEX_PATH so
+workers start without re-training. When a student's embedding changes (or
+the user is deleted) the saved index is updated after the commit, on a
+background thread, under a file lock shared by every process.
+"""
+import logging
+import os
+import queue
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .embeddings import EMBEDDING_SIZE, decode_embedding
+from .face_engine import get_engine
+from .roster import assign_matches
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    def __init__(self, centroids, n_probe=8):
+        self.centroids = np.asarray(centroids, dtype=np.float32).reshape(-1, EMBEDDING_SIZE)
+        self.n_probe = n_probe
+        n_lists = len(self.centroids)
+        self.list_ids = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+        self.list_vectors = [np.empty((0, EMBEDDING_SIZE), dtype=np.float32) for _ in range(n_lists)]
+        self.where = {}  # user id -> list number
+
+    def __len__(self):
+        return len(self.where)
+
+    @classmethod
+    def train(cls, ids, vectors, n_lists=None, n_probe=8, iterations=10, seed=0):
+        """k-means (Lloyd) on the vectors, then add them all."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_SIZE)
+        n = len(vectors)
+        n_lists = max(1, min(n_lists or int(np.sqrt(n)), n))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, n_lists, replace=False)] if n else np.zeros((1, EMBEDDING_SIZE))
+
+        for _ in range(iterations if n else 0):
+            assignment = _nearest(vectors, centroids)
+            for c in range(n_lists):
+                members = vectors[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+
+        index = cls(centroids, n_probe=n_probe)
+        index.add_many(ids, vectors)
+        return index
+
+    def add_many(self, ids, vectors):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_SIZE)
+        for user_id in ids:
+            self.remove(int(user_id))
+        assignment = _nearest(vectors, self.centroids) if len(vectors) else []
+        for c in np.unique(assignment):
+            mask = assignment == c
+            self.list_ids[c] = np.concatenate([self.list_ids[c], ids[mask]])
+            self.list_vectors[c] = np.vstack([self.list_vectors[c], vectors[mask]])
+            for user_id in ids[mask]:
+                self.where[int(user_id)] = int(c)
+
+    def add(self, user_id, vector):
+        self.add_many([user_id], [vector])
+
+    def remove(self, user_id):
+        c = self.where.pop(user_id, None)
+        if c is None:
+            return
+        keep = self.list_ids[c] != user_id
+        self.list_ids[c] = self.list_ids[c][keep]
+        self.list_vectors[c] = self.list_vectors[c][keep]
+
+    def search(self, probes, k=1):
+        """
+        k nearest enrolled users for each probe.
+        Returns (ids, distances), both (len(probes), k); missing slots are -1 / inf.
+        """
+        probes = np.asarray(probes, dtype=np.float32).reshape(-1, EMBEDDING_SIZE)
+        ids = np.full((len(probes), k), -1, dtype=np.int64)
+        distances = np.full((len(probes), k), np.inf)
+        n_probe = min(self.n_probe, len(self.centroids))
+
+        cells = np.argsort(_sq_distances(probes, self.centroids), axis=1)[:, :n_probe]
+        for q, probe in enumerate(probes):
+            cand_ids = np.concatenate([self.list_ids[c] for c in cells[q]])
+            if not len(cand_ids):
+                continue
+            cand_vectors = np.vstack([self.list_vectors[c] for c in cells[q]])
+            d = np.sqrt(np.maximum(_sq_distances(probe[None, :], cand_vectors)[0], 0.0))
+            top = np.argsort(d)[:k]
+            ids[q, :len(top)] = cand_ids[top]
+            distances[q, :len(top)] = d[top]
+        return ids, distances
+
+    def save(self, path):
+        """Write atomically so other workers never read a half-written file."""
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.face_index-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    n_probe=self.n_probe,
+                    ids=np.concatenate(self.list_ids),
+                    vectors=np.vstack(self.list_vectors),
+                    lists=np.repeat(np.arange(len(self.list_ids)), [len(ids) for ids in self.list_ids]),
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        index = cls(data['centroids'], n_probe=int(data['n_probe']))
+        for c in range(len(index.centroids)):
+            mask = data['lists'] == c
+            index.list_ids[c] = data['ids'][mask]
+            index.list_vectors[c] = data['vectors'][mask]
+            for user_id in index.list_ids[c]:
+                index.where[int(user_id)] = c
+        return index
+
+
+def _sq_distances(a, b):
+    return (np.einsum('ij,ij->i', a, a)[:, None] + np.einsum('ij,ij->i', b, b)[None, :] - 2.0 * a @ b.T)
+
+
+def _nearest(vectors, centroids):
+    return np.argmin(_sq_distances(vectors, centroids), axis=1)
+
+
+# ---------------------------------------------------------
+# The campus-wide index of this worker process
+# ---------------------------------------------------------
+_campus_index = None
+_campus_mtime = None
+_campus_lock = threading.Lock()
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on <path>.lock, shared by every worker process and command."""
+    with open(f"{path}.lock", 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _mtime(path):
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+
+def campus_rows(user_ids=None):
+    """(id, embedding bytes) of the students the campus index should hold."""
+    from .models import User
+
+    rows = (
+        User.objects.filter(role='STUDENT', face_embedding_engine=get_engine().name)
+        .exclude(face_embedding=None)
+    )
+    if user_ids is not None:
+        rows = rows.filter(id__in=user_ids)
+    return rows.values_list('id', 'face_embedding')
+
+
+def _train_campus_index():
+    ids, vectors = [], []
+    for user_id, data in campus_rows().iterator():
+        ids.append(user_id)
+        vectors.append(decode_embedding(data))
+    return IVFIndex.train(
+        ids,
+        np.vstack(vectors) if vectors else np.empty((0, EMBEDDING_SIZE)),
+        n_lists=settings.FACE_ANN_LISTS,
+        n_probe=settings.FACE_ANN_PROBE,
+    )
+
+
+def build_campus_index():
+    """Train a fresh index over every stored student embedding and save it."""
+    global _campus_index, _campus_mtime
+    path = settings.FACE_ANN_INDEX_PATH
+    with _campus_lock, _file_lock(path):
+        index = _train_campus_index()
+        index.save(path)
+        _campus_index, _campus_mtime = index, _mtime(path)
+    return index
+
+
+def get_campus_index():
+    """Load the saved index (reloading if another worker rewrote it), or build one."""
+    path = settings.FACE_ANN_INDEX_PATH
+    with _campus_lock:
+        if _campus_index is not None and _mtime(path) == _campus_mtime:
+            return _campus_index
+    return _modify_campus_index()
+
+
+def _modify_campus_index(change=None):
+    """
+    Read-modify-write under the file lock: reload the saved index (another
+    worker may have changed it), apply `change`, save. Concurrent updates
+    from several processes are applied one after the other, none is lost.
+    Without `change` this just (re)loads, training the index if none is saved.
+    """
+    global _campus_index, _campus_mtime
+    path = settings.FACE_ANN_INDEX_PATH
+    with _campus_lock, _file_lock(path):
+        mtime = _mtime(path)
+        if mtime is None:
+            index = _train_campus_index()
+        elif _campus_index is not None and mtime == _campus_mtime:
+            index = _campus_index
+        else:
+            index = IVFIndex.load(path)
+        if change is not None:
+            change(index)
+        if change is not None or mtime is None:
+            index.save(path)
+        _campus_index, _campus_mtime = index, _mtime(path)
+        return index
+
+
+def update_campus_users(user_ids):
+    """
+    Bring the given users up to date in the saved index: current students
+    with an embedding are (re)added, everyone else (deleted users, other
+    roles, no face) is removed.
+    """
+    user_ids = {int(user_id) for user_id in user_ids}
+
+    def change(index):
+        # Read under the file lock: rows read before it could be older than
+        # what a concurrent update (which read after us) has already saved
+        rows = dict(campus_rows(user_ids))
+        for user_id in user_ids - rows.keys():
+            index.remove(user_id)
+        if rows:
+            index.add_many(list(rows), [decode_embedding(data) for data in rows.values()])
+
+    _modify_campus_index(change)
+
+
+class CampusIndexUpdater:
+    """
+    Applies queued user changes to the saved index on a background thread,
+    so a signup does not rewrite the index inside its request. Changes that
+    arrive while a write is in progress go out together in the next one.
+    A change lost to a crash is picked up by `manage.py build_face_index`.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, user_id):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='campus-index-updater', daemon=True)
+                self._thread.start()
+        self._queue.put(user_id)
+
+    def _run(self):
+        while True:
+            user_ids = {self._queue.get()}
+            while True:
+                try:
+                    user_ids.add(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                update_campus_users(user_ids)
+            except Exception:
+                logger.exception("Could not update the campus face index")
+            finally:
+                close_old_connections()
+
+
+campus_updater = CampusIndexUpdater()
+
+
+def schedule_campus_update(user_id):
+    """Update one user in the campus index once the current transaction commits."""
+    transaction.on_commit(lambda: campus_updater.submit(user_id))
+
+
+def identify_campus(probes, threshold=None):
+    """Like RosterIndex.identify, but against every enrolled user on campus."""
+    if len(probes) == 0:
+        return []
+    ids, distances = get_campus_index().search(probes, k=1)
+    return assign_matches(ids[:, 0], distances[:, 0], threshold)
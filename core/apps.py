@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Dedicated verification workers: load dlib at startup, not on the first check-in
+        from django.conf import settings
+        if settings.FACE_ENGINE_WARMUP:
+            from .face_engine import warm_up
+            warm_up()
@@ -0,0 +1,71 @@
+# core/campus.py
+"""
+In-memory index of building geofences.
+
+Every Building outline is compiled once into a CompiledPolygon and bucketed
+in a PolygonGrid (core/geofence.py). The index is rebuilt only when the
+buildings change: a cheap (count, last update) fingerprint is checked on
+each lookup, so every worker notices edits made anywhere.
+"""
+import logging
+import threading
+
+from django.db.models import Count, Max
+
+from .geofence import CompiledPolygon, PolygonGrid
+from .models import Building
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_index = None
+_fingerprint = None
+
+
+def build_building_index():
+    polygons = {}
+    for pk, outline, margin in Building.objects.values_list('id', 'outline', 'margin_meters'):
+        try:
+            polygons[pk] = CompiledPolygon(outline, margin_m=margin)
+        except (TypeError, ValueError) as e:
+            # One bad outline must not break every other building's geofence
+            logger.warning("Skipping building %s: unusable outline (%s)", pk, e)
+    return PolygonGrid(polygons)
+
+
+def find_building(block, campus=None):
+    """
+    The building with this block code, or None. Block codes are only unique
+    per campus: pass `campus` (id or name) when there is more than one; an
+    ambiguous block raises Building.MultipleObjectsReturned.
+    """
+    buildings = Building.objects.filter(block__iexact=block)
+    if campus:
+        campus = str(campus)
+        buildings = buildings.filter(campus_id=campus) if campus.isdigit() else buildings.filter(campus__name__iexact=campus)
+    try:
+        return buildings.get()
+    except Building.DoesNotExist:
+        return None
+
+
+def get_building_index():
+    global _index, _fingerprint
+    state = Building.objects.aggregate(n=Count('id'), updated=Max('updated_at'))
+    fingerprint = (state['n'], state['updated'])
+    with _lock:
+        if _index is None or fingerprint != _fingerprint:
+            _index = build_building_index()
+            _fingerprint = fingerprint
+        return _index
+
+
+def inside_building(building_id, lat, lon):
+    """
+    Is the point inside (or within the GPS margin of) the building outline?
+    None if the building has no usable outline.
+    """
+    index = get_building_index()
+    if building_id not in index.polygons:
+        return None
+    return index.contains(building_id, lat, lon)
@@ -0,0 +1,85 @@
+# core/embeddings.py
+"""Persisted face embeddings for the reference photo of each User."""
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+
+from .cache import LRUCache
+from .face_engine import get_engine
+from .utils import EMBEDDING_SIZE, compute_face_encoding  # noqa: F401 (EMBEDDING_SIZE is re-exported)
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DTYPE = np.float64
+
+# Per-process cache of decoded embeddings, keyed by (user id, embedding version)
+reference_cache = LRUCache(
+    max_entries=settings.FACE_EMBEDDING_CACHE_MAX_ENTRIES,
+    max_bytes=settings.FACE_EMBEDDING_CACHE_MAX_BYTES,
+)
+
+
+def encode_embedding(encoding):
+    """numpy vector -> bytes for the BinaryField."""
+    return np.asarray(encoding, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def decode_embedding(data):
+    """bytes from the BinaryField -> numpy vector (or None)."""
+    if not data:
+        return None
+    return np.frombuffer(bytes(data), dtype=EMBEDDING_DTYPE)
+
+
+def embedding_is_stale(user):
+    """True when the stored embedding was not computed from the current reference image by the current engine."""
+    ref = user.face_reference
+    return (
+        (ref.name if ref else '') != user.face_embedding_source
+        or user.face_embedding_engine != get_engine().name
+    )
+
+
+def refresh_face_embedding(user, force=False):
+    """
+    Recompute the embedding if the reference image changed (or force=True).
+    Writes with a queryset update so post_save is not triggered again.
+    Returns True if the embedding was recomputed.
+    """
+    if not force and not embedding_is_stale(user):
+        return False
+
+    ref = user.face_reference
+    encoding = None
+    if ref:
+        try:
+            encoding = compute_face_encoding(ref.path)
+        except Exception:
+            logger.exception("Could not read reference image for %s", user.username)
+
+    user.face_embedding = encode_embedding(encoding) if encoding is not None else None
+    user.face_embedding_source = ref.name if ref else ''
+    user.face_embedding_engine = get_engine().name
+    reference_cache.discard((user.pk, user.face_embedding_version))
+    user.face_embedding_version += 1
+
+    type(user).objects.filter(pk=user.pk).update(
+        face_embedding=user.face_embedding,
+        face_embedding_source=user.face_embedding_source,
+        face_embedding_engine=user.face_embedding_engine,
+        face_embedding_version=F('face_embedding_version') + 1,
+    )
+    return True
+
+
+def get_reference_embedding(user):
+    """
+    The user's reference embedding, served from the in-process cache when possible
+    and computed on the spot if it was never stored.
+    """
+    if embedding_is_stale(user):
+        refresh_face_embedding(user)
+    key = (user.pk, user.face_embedding_version)
+    return reference_cache.get_or_set(key, lambda: decode_embedding(user.face_embedding))
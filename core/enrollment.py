@@ -0,0 +1,176 @@
+# core/enrollment.py
+"""
+Bulk student enrollment from a CSV file and a directory of photos.
+
+Photos are encoded on a process pool (one task per photo, all cores; the
+task lives in core/enrollment_worker.py), and students are written chunk by
+chunk with bulk_create, each chunk in its own transaction and then added to
+the campus index. A rerun skips usernames that already exist, so an
+interrupted import resumes where it stopped. Students whose photo fails (unreadable, no
+face, several faces) are not created; they are reported instead.
+"""
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .ann import update_campus_users
+from .enrollment_worker import encode_photo
+from .face_engine import get_engine, warm_up
+from .models import Course, User
+from .response_cache import invalidate
+
+PHOTO_EXTENSIONS = ['.jpg', '.jpeg', '.png']
+
+
+@dataclass
+class EnrollmentRow:
+    username: str
+    first_name: str = ''
+    last_name: str = ''
+    email: str = ''
+    department: str = ''
+    password: str = ''
+    photo: str = ''  # path to the photo file ('' if not found)
+
+
+@dataclass
+class EnrollmentResult:
+    created: int = 0
+    skipped: int = 0
+    failures: list = field(default_factory=list)  # (username, photo, reason)
+
+
+def read_roster_csv(csv_path, photos_dir):
+    """
+    Rows of the enrollment CSV. Only `username` is required; `photo` defaults
+    to <username>.jpg/.jpeg/.png in photos_dir.
+    """
+    photos_dir = Path(photos_dir)
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for record in csv.DictReader(f):
+            record = {key.strip().lower(): (value or '').strip() for key, value in record.items() if key}
+            username = record.get('username')
+            if not username:
+                continue
+            photo = record.get('photo') or ''
+            if photo:
+                photo = str(photos_dir / photo)
+            else:
+                photo = next((str(photos_dir / f"{username}{ext}") for ext in PHOTO_EXTENSIONS
+                              if (photos_dir / f"{username}{ext}").exists()), '')
+            yield EnrollmentRow(
+                username=username,
+                first_name=record.get('first_name', ''),
+                last_name=record.get('last_name', ''),
+                email=record.get('email', ''),
+                department=record.get('department', ''),
+                password=record.get('password', ''),
+                photo=photo,
+            )
+
+
+def store_photo(row):
+    """Copy the photo into MEDIA_ROOT/profiles/ (deduplicated by content, so reruns reuse it)."""
+    with open(row.photo, 'rb') as f:
+        return default_storage.save(f"profiles/{Path(row.photo).name}", File(f))
+
+
+def enroll_students(rows, course=None, workers=None, chunk_size=200, progress=None):
+    """Create the students in `rows`; returns an EnrollmentResult."""
+    result = EnrollmentResult()
+    course = Course.objects.get(pk=course) if isinstance(course, int) else course
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=warm_up) as pool:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                _enroll_chunk(pool, chunk, course, result)
+                chunk = []
+                if progress:
+                    progress(result)
+        if chunk:
+            _enroll_chunk(pool, chunk, course, result)
+            if progress:
+                progress(result)
+    return result
+
+
+def _enroll_chunk(pool, chunk, course, result):
+    # Resume: anyone already in the database was created by an earlier run
+    existing = set(User.objects.filter(username__in=[row.username for row in chunk])
+                   .values_list('username', flat=True))
+    todo, queued = [], set()
+    for row in chunk:
+        if row.username in existing:
+            result.skipped += 1
+        elif row.username in queued:
+            result.failures.append((row.username, row.photo, "username repeated in the CSV"))
+        else:
+            todo.append(row)
+            queued.add(row.username)
+
+    outcomes = pool.map(encode_photo, [row.photo for row in todo], [row.password for row in todo])
+    users = []
+    for row, (embedding, password, error) in zip(todo, outcomes):
+        if error:
+            result.failures.append((row.username, row.photo, error))
+            continue
+        photo_name = store_photo(row)
+        users.append(User(
+            username=row.username,
+            first_name=row.first_name,
+            last_name=row.last_name,
+            email=row.email,
+            department=row.department or None,
+            password=password,
+            role='STUDENT',
+            profile_image=photo_name,
+            face_embedding=embedding,
+            face_embedding_source=photo_name,
+            face_embedding_version=1,
+            face_embedding_engine=get_engine().name,
+        ))
+    if not users:
+        return
+
+    with transaction.atomic():
+        # ignore_conflicts: a username taken since the check above is skipped, not fatal
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        # bulk_create leaves pk unset when ignoring conflicts. Every password
+        # hash is salted, so a matching hash means the row is ours and not a
+        # user someone else created in the meantime.
+        ours = {user.username: user.password for user in users}
+        saved = {
+            username: pk for pk, username, password
+            in User.objects.filter(username__in=ours).values_list('id', 'username', 'password')
+            if ours[username] == password
+        }
+        if course is not None:
+            Enrollment = Course.students.through
+            Enrollment.objects.bulk_create(
+                [Enrollment(course_id=course.pk, user_id=user_id) for user_id in saved.values()],
+                ignore_conflicts=True,
+            )
+    for row in todo:
+        if row.username in ours and row.username not in saved:
+            result.failures.append((row.username, row.photo, "username already taken"))
+    result.created += len(saved)
+    if saved:
+        # Index each committed chunk, so an interrupted import leaves the index
+        # matching the database (bulk_create sends no post_save signals)
+        update_campus_users(list(saved.values()))
+        invalidate('home_stats')
+
+
+def write_failure_report(failures, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['username', 'photo', 'reason'])
+        writer.writerows(failures)
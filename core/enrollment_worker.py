@@ -0,0 +1,33 @@
+# core/enrollment_worker.py
+"""
+Pool tasks for the bulk enrollment import (core/enrollment.py).
+
+Pool processes unpickle tasks by importing their module. Under the 'spawn'
+or 'forkserver' start methods (Windows, macOS, Python 3.14+ on Linux) that
+happens in a fresh interpreter where django.setup() never ran, so this
+module must not import models (directly or through another core module):
+only settings, the face engine and the embedding helpers.
+"""
+import os
+
+from django.contrib.auth.hashers import make_password
+
+from .embeddings import encode_embedding
+from .utils import compute_face_encodings, prepare_face_image
+
+
+def encode_photo(path, password=''):
+    """(embedding bytes, hashed password, error) for one photo, as plain values."""
+    if not path or not os.path.exists(path):
+        return None, None, "photo not found"
+    try:
+        image = prepare_face_image(path)
+    except Exception as e:
+        return None, None, f"unreadable photo ({e})"
+    locations, encodings = compute_face_encodings(image)
+    if len(encodings) == 0:
+        return None, None, "no face found"
+    if len(encodings) > 1:
+        return None, None, f"{len(encodings)} faces found"
+    # Password hashing is deliberately slow; do it on the pool as well
+    return encode_embedding(encodings[0]), make_password(password or None), None
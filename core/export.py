@@ -0,0 +1,104 @@
+# core/export.py
+"""
+Bulk attendance export.
+
+Rows are read with .iterator(chunk_size=...) over a flat values_list, so
+neither the CSV stream nor the Parquet writer ever holds more than one chunk
+of records in memory, however long the semester is.
+"""
+import csv
+
+from django.conf import settings
+
+from .models import AttendanceRecord
+
+EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('timestamp', 'timestamp'),
+    ('status', 'status'),
+    ('student', 'student__username'),
+    ('department', 'student__department'),
+    ('course', 'session__course__name'),
+    ('session', 'session_id'),
+    ('room', 'session__room_no'),
+    ('gps_lat', 'gps_lat'),
+    ('gps_long', 'gps_long'),
+]
+EXPORT_COLUMNS = [column for column, _ in EXPORT_FIELDS]
+
+
+def export_queryset(course=None, date_from=None, date_to=None, department=None, status=None):
+    """Flat rows for the export, oldest first. Dates are inclusive."""
+    records = AttendanceRecord.objects.all()
+    if course is not None:
+        records = records.filter(session__course_id=course)
+    if date_from is not None:
+        records = records.filter(timestamp__date__gte=date_from)
+    if date_to is not None:
+        records = records.filter(timestamp__date__lte=date_to)
+    if department:
+        records = records.filter(student__department=department)
+    if status:
+        records = records.filter(status=status)
+    return records.order_by('id').values_list(*[field for _, field in EXPORT_FIELDS])
+
+
+def iter_rows(queryset, chunk_size=None):
+    return queryset.iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE)
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, chunk_size=None):
+    """Yield the export as CSV text, header first, one line at a time."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in iter_rows(queryset, chunk_size):
+        timestamp = row[1]
+        yield writer.writerow([*row[:1], timestamp.isoformat(), *row[2:]])
+
+
+def write_parquet(queryset, path, chunk_size=None):
+    """
+    Write the export as Parquet, one row group per chunk. Needs pyarrow
+    (optional; ImportError is left to the caller). Returns the row count.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('status', pa.string()),
+        ('student', pa.string()),
+        ('department', pa.string()),
+        ('course', pa.string()),
+        ('session', pa.int64()),
+        ('room', pa.string()),
+        ('gps_lat', pa.float64()),
+        ('gps_long', pa.float64()),
+    ])
+    total = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        def flush(chunk):
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=schema.field(i).type) for i, values in enumerate(columns)], schema=schema
+            ))
+            return len(chunk)
+
+        chunk = []
+        for row in iter_rows(queryset, chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                total += flush(chunk)
+                chunk = []
+        if chunk:
+            total += flush(chunk)
+    return total
@@ -0,0 +1,204 @@
+# core/face_engine.py
+"""
+Pluggable face engines: detect -> embed -> compare.
+
+An engine turns an RGB image into face boxes (detect), the boxes into
+128-d embeddings (embed), and compares embeddings by euclidean distance
+(compare) against its own `threshold`. Everything downstream (stored
+embeddings, course rosters, the campus ANN index) only sees those vectors,
+so engines are interchangeable. FACE_ENGINE picks one:
+
+    'dlib'    face_recognition: HOG detector + ResNet encoder
+    'opencv'  OpenCV DNN: YuNet detector + SFace encoder (ONNX models, CPU)
+
+Embeddings from different engines are not comparable. After switching,
+run `manage.py backfill_face_embeddings` (stale embeddings are detected by
+User.face_embedding_engine) and `manage.py build_face_index`.
+
+Backends are imported on first use, so web workers that never look at a
+face never load them. Verification workers load them up front with
+warm_up() (the verification pool's initializer, or FACE_ENGINE_WARMUP=1 for
+a whole process via CoreConfig.ready()).
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+class FaceEngine:
+    name = None
+    # Max distance between two embeddings of the same person (lower = stricter)
+    threshold = None
+    # PIL mode of the downscaled copy passed to detect() ('L' or 'RGB')
+    detect_mode = 'RGB'
+
+    def __init__(self):
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+        return self
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def _load(self):
+        raise NotImplementedError
+
+    def detect(self, image):
+        """(top, right, bottom, left) boxes of the faces in `image`."""
+        raise NotImplementedError
+
+    def embed(self, image, locations):
+        """One 128-d embedding per box in `locations` (boxes in `image` coordinates)."""
+        raise NotImplementedError
+
+    def compare(self, known_embeddings, embedding):
+        """Distances from `embedding` to each known one (plain NumPy: loads nothing)."""
+        known = np.asarray(known_embeddings, dtype=np.float64)
+        if len(known) == 0:
+            return np.empty(0)
+        return np.linalg.norm(known - embedding, axis=1)
+
+    def warm_up(self):
+        """Load the backend and run it once, so model weights are in memory too."""
+        self.load()
+        blank = np.zeros((64, 64, 3), dtype=np.uint8)
+        self.detect(blank)
+        self.embed(blank, [(0, 64, 64, 0)])
+
+
+class DlibFaceEngine(FaceEngine):
+    """face_recognition (dlib HOG detector + ResNet encoder)."""
+
+    name = 'dlib'
+    threshold = 0.5  # stricter than face_recognition's 0.6 default
+    detect_mode = 'L'  # HOG only needs luminance
+
+    def _load(self):
+        import face_recognition
+        self.face_recognition = face_recognition
+
+    def detect(self, image):
+        return self.load().face_recognition.face_locations(image)
+
+    def embed(self, image, locations):
+        return self.load().face_recognition.face_encodings(image, known_face_locations=locations)
+
+
+class OpenCVFaceEngine(FaceEngine):
+    """
+    OpenCV DNN on CPU: YuNet (detection + 5 landmarks) and SFace (128-d
+    embedding of the aligned 112x112 crop). Needs opencv-python(-headless)
+    and the two ONNX files from the OpenCV model zoo (FACE_OPENCV_*_MODEL).
+    """
+
+    name = 'opencv'
+    # L2 distance between unit-length SFace features; the same decision as
+    # OpenCV's recommended cosine similarity of 0.363
+    threshold = 1.128
+    detect_mode = 'RGB'
+
+    def _load(self):
+        try:
+            import cv2
+        except ImportError:
+            raise ImproperlyConfigured("FACE_ENGINE='opencv' needs opencv-python (pip install opencv-python-headless).")
+        detector_model = str(settings.FACE_OPENCV_DETECTOR_MODEL)
+        recognizer_model = str(settings.FACE_OPENCV_RECOGNIZER_MODEL)
+        for path in (detector_model, recognizer_model):
+            try:
+                open(path, 'rb').close()
+            except OSError:
+                raise ImproperlyConfigured(f"Face model not found: {path}")
+        self.cv2 = cv2
+        self.detector = cv2.FaceDetectorYN.create(
+            detector_model, '', (320, 320), settings.FACE_OPENCV_SCORE_THRESHOLD, 0.3, 5000
+        )
+        self.recognizer = cv2.FaceRecognizerSF.create(recognizer_model, '')
+        # Neither model instance is safe to share between threads (kiosk and
+        # sync verification call one engine from many request threads)
+        self.detect_lock = threading.Lock()
+        self.recognize_lock = threading.Lock()
+
+    def _detect_rows(self, bgr):
+        height, width = bgr.shape[:2]
+        with self.detect_lock:
+            self.detector.setInputSize((width, height))
+            _, faces = self.detector.detect(bgr)
+        return [] if faces is None else list(faces)
+
+    def detect(self, image):
+        self.load()
+        height, width = image.shape[:2]
+        boxes = []
+        for row in self._detect_rows(self._bgr(image)):
+            x, y, w, h = row[:4]
+            boxes.append((
+                max(0, int(y)), min(width, int(x + w)), min(height, int(y + h)), max(0, int(x)),
+            ))
+        return boxes
+
+    def embed(self, image, locations):
+        self.load()
+        bgr = self._bgr(image)
+        height, width = bgr.shape[:2]
+        embeddings = []
+        for top, right, bottom, left in locations:
+            # Re-detect inside a padded crop to get the landmarks for alignment
+            pad = max(bottom - top, right - left) // 4
+            y0, y1 = max(0, top - pad), min(height, bottom + pad)
+            x0, x1 = max(0, left - pad), min(width, right + pad)
+            crop = bgr[y0:y1, x0:x1]
+            rows = self._detect_rows(crop) if crop.size else []
+            with self.recognize_lock:
+                if rows:
+                    aligned = self.recognizer.alignCrop(crop, max(rows, key=lambda r: r[-1]))
+                else:
+                    aligned = self.cv2.resize(bgr[top:bottom, left:right], (112, 112))
+                feature = self.recognizer.feature(aligned).reshape(-1).astype(np.float64)
+            embeddings.append(feature / (np.linalg.norm(feature) or 1.0))
+        return embeddings
+
+    def _bgr(self, image):
+        if image.ndim == 2:
+            return self.cv2.cvtColor(image, self.cv2.COLOR_GRAY2BGR)
+        return np.ascontiguousarray(image[:, :, ::-1])
+
+
+ENGINES = {
+    DlibFaceEngine.name: DlibFaceEngine,
+    OpenCVFaceEngine.name: OpenCVFaceEngine,
+}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def create_engine(name):
+    try:
+        return ENGINES[name]()
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown FACE_ENGINE {name!r}; choose one of {sorted(ENGINES)}.")
+
+
+def get_engine():
+    """The engine selected by FACE_ENGINE (one per process)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine.name != settings.FACE_ENGINE:
+            _engine = create_engine(settings.FACE_ENGINE)
+        return _engine
+
+
+def warm_up():
+    """Load the face backend now rather than on the first check-in."""
+    get_engine().warm_up()
@@ -0,0 +1,196 @@
+# core/geofence.py
+"""
+Fast classroom geofence checks.
+
+At classroom radii (a few hundred metres) the earth is flat for our purposes:
+a local planar approximation using the WGS-84 radii of curvature at the
+centre's latitude is within millimetres of geopy's geodesic solver, and a
+lat/long bounding box rejects far-away points before any trigonometry.
+geodesic is kept as an opt-in high-precision mode (GEOFENCE_PRECISE).
+
+Buildings with polygon outlines are compiled into CompiledPolygon objects and
+bucketed in a PolygonGrid (see core/campus.py for the cached campus index).
+"""
+import math
+from bisect import bisect_right
+
+import numpy as np
+from django.conf import settings
+from geopy.distance import geodesic
+
+# WGS-84
+WGS84_A = 6378137.0
+WGS84_E2 = 6.69437999014e-3
+# Mean earth radius, for haversine
+EARTH_RADIUS_M = 6371008.8
+
+
+def radii_of_curvature(lat_deg):
+    """(meridional, prime-vertical) radii in metres at a latitude."""
+    s = math.sin(math.radians(lat_deg))
+    w = 1.0 - WGS84_E2 * s * s
+    return WGS84_A * (1.0 - WGS84_E2) / (w * math.sqrt(w)), WGS84_A / math.sqrt(w)
+
+
+def metres_per_degree(lat_deg):
+    """(metres per degree of latitude, metres per degree of longitude) at a latitude."""
+    m, n = radii_of_curvature(lat_deg)
+    return math.radians(m), math.radians(n * math.cos(math.radians(lat_deg)))
+
+
+def outside_bounding_box(point, center, radius_m):
+    """Cheap reject: True if the point cannot be within radius_m of center."""
+    per_lat, per_lon = metres_per_degree(center[0])
+    if abs(point[0] - center[0]) * per_lat > radius_m:
+        return True
+    # Near the poles a degree of longitude is ~0 m: don't reject on it
+    return per_lon > 1.0 and abs(point[1] - center[1]) * per_lon > radius_m
+
+
+def local_distance_m(point, center):
+    """Planar distance using the ellipsoid's local scale at center (short ranges)."""
+    per_lat, per_lon = metres_per_degree(center[0])
+    return math.hypot((point[0] - center[0]) * per_lat, (point[1] - center[1]) * per_lon)
+
+
+def haversine_m(lats, lons, lat0, lon0):
+    """
+    Great-circle distance in metres on a spherical earth; accepts scalars or
+    NumPy arrays. Good for ranking far-apart points, but the sphere is off by
+    up to ~0.5% from WGS-84, so radius checks use the planar distance instead.
+    """
+    lat1, lon1 = np.radians(lats), np.radians(lons)
+    lat2, lon2 = np.radians(lat0), np.radians(lon0)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def within_radius(point, center, radius_m, precise=None):
+    """Is (lat, long) `point` within radius_m metres of `center`?"""
+    if precise is None:
+        precise = settings.GEOFENCE_PRECISE
+    if outside_bounding_box(point, center, radius_m):
+        return False
+    if precise:
+        return geodesic(point, center).meters <= radius_m
+    return local_distance_m(point, center) <= radius_m
+
+
+def within_radius_many(lats, lons, center, radius_m):
+    """Vectorized check for a batch of points: boolean array."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    per_lat, per_lon = metres_per_degree(center[0])
+    inside = np.abs(lats - center[0]) * per_lat <= radius_m
+    if per_lon > 1.0:
+        inside &= np.abs(lons - center[1]) * per_lon <= radius_m
+    result = np.zeros(lats.shape, dtype=bool)
+    dy = (lats[inside] - center[0]) * per_lat
+    dx = (lons[inside] - center[1]) * per_lon
+    result[inside] = np.hypot(dx, dy) <= radius_m
+    return result
+
+
+class CompiledPolygon:
+    """
+    A polygon outline ([(lat, long), ...]) prepared for repeated point tests.
+
+    The edges are sorted into horizontal slabs between consecutive vertex
+    latitudes, so a test bisects to one slab and ray-casts only against the
+    few edges crossing it. Points outside the outline but within margin_m
+    metres of an edge still count (GPS drifts indoors).
+    """
+
+    def __init__(self, outline, margin_m=0.0):
+        points = np.asarray(outline, dtype=np.float64).reshape(-1, 2)
+        if len(points) < 3:
+            raise ValueError("A polygon needs at least three points.")
+        self.margin_m = margin_m
+        self.min_lat, self.min_lon = points.min(axis=0)
+        self.max_lat, self.max_lon = points.max(axis=0)
+        self.center = tuple(points.mean(axis=0))
+        self.per_lat, self.per_lon = metres_per_degree(self.center[0])
+        # Bounding box grown by the margin, in degrees
+        self.pad_lat = margin_m / self.per_lat
+        self.pad_lon = margin_m / max(self.per_lon, 1.0)
+
+        starts, ends = points, np.roll(points, -1, axis=0)
+        self.edges = np.hstack([starts, ends])  # lat1, lon1, lat2, lon2
+        self.bounds = np.unique(points[:, 0])
+        slabs = []
+        for low, high in zip(self.bounds[:-1], self.bounds[1:]):
+            crossing = [
+                (lat1, lon1, lat2, lon2) for lat1, lon1, lat2, lon2 in self.edges
+                if min(lat1, lat2) <= low and max(lat1, lat2) >= high
+            ]
+            slabs.append(crossing)
+        self.slabs = slabs
+
+    def bbox(self):
+        """(min_lat, min_lon, max_lat, max_lon) including the margin."""
+        return (self.min_lat - self.pad_lat, self.min_lon - self.pad_lon,
+                self.max_lat + self.pad_lat, self.max_lon + self.pad_lon)
+
+    def _inside(self, lat, lon):
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon):
+            return False
+        slab = min(max(bisect_right(self.bounds, lat) - 1, 0), len(self.slabs) - 1)
+        inside = False
+        for lat1, lon1, lat2, lon2 in self.slabs[slab]:
+            if (lat1 > lat) != (lat2 > lat):
+                crossing = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+                if crossing > lon:
+                    inside = not inside
+        return inside
+
+    def distance_to_edge_m(self, lat, lon):
+        """Shortest distance from the point to the outline, in metres."""
+        # Local planar frame around the point
+        ax = (self.edges[:, 1] - lon) * self.per_lon
+        ay = (self.edges[:, 0] - lat) * self.per_lat
+        bx = (self.edges[:, 3] - lon) * self.per_lon
+        by = (self.edges[:, 2] - lat) * self.per_lat
+        dx, dy = bx - ax, by - ay
+        length2 = dx * dx + dy * dy
+        t = np.clip(-(ax * dx + ay * dy) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+        return float(np.hypot(ax + t * dx, ay + t * dy).min())
+
+    def contains(self, lat, lon):
+        min_lat, min_lon, max_lat, max_lon = self.bbox()
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        if self._inside(lat, lon):
+            return True
+        return self.margin_m > 0 and self.distance_to_edge_m(lat, lon) <= self.margin_m
+
+
+class PolygonGrid:
+    """
+    Many polygons bucketed into a fixed lat/long grid. A lookup hashes the
+    point to its cell and tests only the polygons whose boxes overlap it.
+    """
+
+    def __init__(self, polygons, cell_deg=0.001):
+        self.cell_deg = cell_deg  # ~110 m
+        self.polygons = dict(polygons)  # key -> CompiledPolygon
+        self.cells = {}
+        for key, polygon in self.polygons.items():
+            min_lat, min_lon, max_lat, max_lon = polygon.bbox()
+            for i in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                for j in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                    self.cells.setdefault((i, j), []).append(key)
+
+    def _cell(self, degrees):
+        return math.floor(degrees / self.cell_deg)
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def contains(self, key, lat, lon):
+        polygon = self.polygons.get(key)
+        return polygon is not None and polygon.contains(lat, lon)
+
+    def locate(self, lat, lon):
+        """Keys of every polygon containing the point."""
+        candidates = self.cells.get((self._cell(lat), self._cell(lon)), ())
+        return [key for key in candidates if self.polygons[key].contains(lat, lon)]
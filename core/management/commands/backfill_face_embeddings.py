@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.embeddings import refresh_face_embedding
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = "Compute and store the face embedding for users whose reference photo has none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Recompute embeddings for every user.")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(Q(profile_image__gt='') | Q(reference_image__gt=''))
+
+        updated = missing = 0
+        for user in users.iterator():
+            if refresh_face_embedding(user, force=options['force']):
+                updated += 1
+                if user.face_embedding is None:
+                    missing += 1
+                    self.stdout.write(self.style.WARNING(f"No face found for {user.username}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} embeddings ({missing} without a face)."))
@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import AttendanceRecord, AttendanceSession, Course, User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large AttendanceRecord table inside a transaction, time the hot lookups "
+        "with the composite indexes and with only the plain FK indexes, then roll everything back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Rolled back the seeded rows.")
+
+    def run(self, rows, repeat):
+        side = max(1, int(rows ** 0.5))
+        self.stdout.write(f"Seeding {side * side:,} records ({side} students x {side} sessions)...")
+        started = time.perf_counter()
+
+        faculty = User.objects.create(username='bench_faculty', role='FACULTY')
+        course = Course.objects.create(name='Benchmark', faculty=faculty)
+        students = User.objects.bulk_create(
+            [User(username=f'bench_student_{i}', role='STUDENT') for i in range(side)], batch_size=1000
+        )
+        sessions = AttendanceSession.objects.bulk_create(
+            [AttendanceSession(course=course, latitude=0, longitude=0, end_time=timezone.now()) for _ in range(side)],
+            batch_size=1000,
+        )
+        batch = []
+        for session in sessions:
+            for student in students:
+                batch.append(AttendanceRecord(session=session, student=student, gps_lat=0, gps_long=0))
+            if len(batch) >= 20000:
+                AttendanceRecord.objects.bulk_create(batch)
+                batch = []
+        AttendanceRecord.objects.bulk_create(batch)
+        self.stdout.write(f"  seeded in {time.perf_counter() - started:.1f}s")
+
+        student, session = students[side // 2], sessions[side // 2]
+        queries = {
+            'cooldown (student, -timestamp)': lambda: AttendanceRecord.objects.filter(student=student)
+            .exclude(status='REJECTED').order_by('-timestamp').first(),
+            'live table (session, -timestamp)': lambda: list(AttendanceRecord.objects.filter(session=session)
+                                                             .order_by('-timestamp')[:50]),
+            'duplicate (session, student)': lambda: AttendanceRecord.objects.filter(
+                session=session, student=student, status__in=['PENDING', 'PRESENT']).exists(),
+        }
+
+        with_indexes = self.time_queries(queries, repeat)
+        # Plain DROP INDEX: transactional, so the rollback brings them back
+        with connection.cursor() as cursor:
+            for index in [*AttendanceRecord._meta.indexes, *AttendanceRecord._meta.constraints]:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+        without_indexes = self.time_queries(queries, repeat)
+
+        self.stdout.write(f"{'query':36} {'composite':>12} {'fk only':>12}")
+        for name in queries:
+            self.stdout.write(
+                f"{name:36} {with_indexes[name]:10.3f}ms {without_indexes[name]:10.3f}ms "
+                f"({without_indexes[name] / with_indexes[name]:.0f}x)"
+            )
+
+    def time_queries(self, queries, repeat):
+        timings = {}
+        for name, query in queries.items():
+            query()  # warm up
+            started = time.perf_counter()
+            for _ in range(repeat):
+                query()
+            timings[name] = (time.perf_counter() - started) / repeat * 1000
+        return timings
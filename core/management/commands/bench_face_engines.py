@@ -0,0 +1,129 @@
+import hashlib
+import itertools
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.face_engine import ENGINES, create_engine
+from core.utils import detect_faces, prepare_face_image
+
+PHOTO_SUFFIXES = ('.jpg', '.jpeg', '.png')
+HASHED_NAME = re.compile(r'^[0-9a-f]{40}$')
+
+
+def photo_label(path):
+    """
+    Who is in the photo, from the file name ('akhi_4jl0rHH.jpeg' -> 'akhi',
+    'Raju_security_ref.jpeg' -> 'raju'); None when the name says nothing
+    (check-in captures, content-addressed files).
+    """
+    if path.parent.name == 'attendance_captures' or HASHED_NAME.match(path.stem):
+        return None
+    return path.stem.split('_')[0].lower()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the face engines on the photos in media/: detect and embed latency, faces found, "
+        "same/different-person accuracy on pairs of labelled photos (label = file name prefix), "
+        "and how often each engine's match decisions agree with the first engine's."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+        parser.add_argument('--dirs', nargs='+', default=['profiles', 'security_references', 'attendance_captures'],
+                            help="Folders under MEDIA_ROOT to read photos from.")
+
+    def handle(self, *args, **options):
+        photos = [
+            path
+            for folder in options['dirs']
+            for path in sorted((Path(settings.MEDIA_ROOT) / folder).rglob('*'))
+            if path.suffix.lower() in PHOTO_SUFFIXES
+        ]
+        # Re-uploads of the same file would count as perfect same-person pairs
+        unique = {}
+        for path in photos:
+            unique.setdefault(hashlib.sha256(path.read_bytes()).hexdigest(), path)
+        duplicates = len(photos) - len(unique)
+        photos = list(unique.values())
+        if not photos:
+            self.stdout.write(self.style.WARNING("No photos found."))
+            return
+        images = [prepare_face_image(path) for path in photos]
+        labels = [photo_label(path) for path in photos]
+        self.stdout.write(
+            f"{len(photos)} photos ({sum(label is not None for label in labels)} labelled, "
+            f"{len(set(filter(None, labels)))} people, {duplicates} duplicates skipped), "
+            f"max side {settings.FACE_IMAGE_MAX_SIDE}"
+        )
+
+        baseline = None
+        for name in options['engines']:
+            engine = create_engine(name)
+            try:
+                started = time.perf_counter()
+                engine.warm_up()
+                load_time = time.perf_counter() - started
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"\n{name}: skipped ({e})"))
+                continue
+            self.stdout.write(f"\n{name} (threshold {engine.threshold}, loaded in {load_time:.2f}s)")
+            decisions = self.bench_engine(engine, images, labels)
+            if baseline is None:
+                baseline = (name, decisions)
+                continue
+            common = decisions.keys() & baseline[1].keys()
+            if common:
+                agree = sum(decisions[pair] == baseline[1][pair] for pair in common)
+                self.stdout.write(f"  agrees with {baseline[0]} on {agree}/{len(common)} pairs ({agree / len(common):.1%})")
+
+    def bench_engine(self, engine, images, labels):
+        """Print the engine's numbers; returns {(photo a, photo b): match?} for every pair with faces."""
+        detect_time = embed_time = 0.0
+        embeddings = {}
+        for i, image in enumerate(images):
+            started = time.perf_counter()
+            locations = detect_faces(image, engine=engine)
+            detect_time += time.perf_counter() - started
+            if not locations:
+                continue
+            started = time.perf_counter()
+            embeddings[i] = np.asarray(engine.embed(image, locations[:1])[0], dtype=np.float64)
+            embed_time += time.perf_counter() - started
+
+        n = len(images)
+        found = len(embeddings)
+        self.stdout.write(f"  detect          : {detect_time / n * 1000:8.1f} ms/photo, faces found in {found}/{n}")
+        if found:
+            self.stdout.write(f"  embed           : {embed_time / found * 1000:8.1f} ms/face")
+            self.stdout.write(f"  detect + embed  : {(detect_time + embed_time) / n * 1000:8.1f} ms/photo")
+
+        decisions = {}
+        # Pairs of labelled photos: same label should match, different should not
+        genuine, impostor = [], []
+        for a, b in itertools.combinations(embeddings, 2):
+            distance = engine.compare([embeddings[a]], embeddings[b])[0]
+            decisions[a, b] = bool(distance < engine.threshold)
+            if labels[a] is not None and labels[b] is not None:
+                (genuine if labels[a] == labels[b] else impostor).append(distance)
+        if not genuine and not impostor:
+            return decisions
+        genuine, impostor = np.asarray(genuine), np.asarray(impostor)
+        accepted = int((genuine < engine.threshold).sum())
+        false_accepts = int((impostor < engine.threshold).sum())
+        correct = accepted + len(impostor) - false_accepts
+        self.stdout.write(
+            f"  same person     : {accepted}/{len(genuine)} pairs matched"
+            + (f" (distance / threshold {genuine.mean() / engine.threshold:.2f})" if len(genuine) else "")
+        )
+        self.stdout.write(
+            f"  different people: {false_accepts}/{len(impostor)} pairs falsely matched"
+            + (f" (distance / threshold {impostor.mean() / engine.threshold:.2f})" if len(impostor) else "")
+        )
+        self.stdout.write(f"  pair accuracy   : {correct / (len(genuine) + len(impostor)):.1%}")
+        return decisions
@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.face_engine import get_engine
+from core.utils import pairwise_face_distance, verify_capture_batch, verify_capture_bytes
+
+
+class Command(BaseCommand):
+    help = "Compare one-by-one face matching against micro-batched matching."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkins', type=int, default=5000,
+                            help="Simulated check-ins for the distance benchmark.")
+        parser.add_argument('--images', default=str(Path(settings.MEDIA_ROOT) / 'security_references'),
+                            help="Directory of face photos for the end-to-end benchmark.")
+        parser.add_argument('--batch-size', type=int, default=settings.FACE_VERIFICATION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.bench_distances(options['checkins'])
+        self.bench_end_to_end(Path(options['images']), options['batch_size'])
+
+    def bench_distances(self, n):
+        rng = np.random.default_rng(0)
+        refs = rng.normal(size=(n, 128)) * 0.1
+        probes = refs + rng.normal(size=(n, 128)) * 0.02
+
+        started = time.perf_counter()
+        engine = get_engine()
+        single = [engine.compare([refs[i]], probes[i])[0] for i in range(n)]
+        one_by_one = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batched = pairwise_face_distance(probes, refs)
+        vectorized = time.perf_counter() - started
+
+        assert np.allclose(single, batched)
+        self.stdout.write(f"Distances for {n} check-ins:")
+        self.stdout.write(f"  one-by-one : {n / one_by_one:12,.0f} checks/s")
+        self.stdout.write(f"  batched    : {n / vectorized:12,.0f} checks/s  ({one_by_one / vectorized:.0f}x)")
+
+    def bench_end_to_end(self, directory, batch_size):
+        photos = [p.read_bytes() for p in sorted(directory.glob('*')) if p.suffix.lower() in ('.jpg', '.jpeg', '.png')]
+        if not photos:
+            self.stdout.write(self.style.WARNING(f"No photos in {directory}, skipping end-to-end run."))
+            return
+
+        photos = (photos * (batch_size // len(photos) + 1))[:batch_size]
+        refs = [np.zeros(128)] * len(photos)
+
+        started = time.perf_counter()
+        for image_bytes, ref in zip(photos, refs):
+            verify_capture_bytes(image_bytes, ref)
+        one_by_one = time.perf_counter() - started
+
+        started = time.perf_counter()
+        verify_capture_batch(photos, refs)
+        batched = time.perf_counter() - started
+
+        self.stdout.write(f"End-to-end decode + encode + match for {len(photos)} photos:")
+        self.stdout.write(f"  one-by-one : {len(photos) / one_by_one:8.2f} checks/s")
+        self.stdout.write(f"  batched    : {len(photos) / batched:8.2f} checks/s")
@@ -0,0 +1,70 @@
+import itertools
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from core.face_engine import get_engine
+from core.utils import compute_face_encoding
+
+
+class Command(BaseCommand):
+    help = "Latency and accuracy of downscale-before-detect vs full-resolution encoding on the photos in media/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dirs', nargs='+', default=['profiles', 'security_references', 'attendance_captures'],
+                            help="Folders under MEDIA_ROOT to read photos from.")
+
+    def handle(self, *args, **options):
+        photos = [
+            path
+            for folder in options['dirs']
+            for path in sorted((Path(settings.MEDIA_ROOT) / folder).rglob('*'))
+            if path.suffix.lower() in ('.jpg', '.jpeg', '.png')
+        ]
+        if not photos:
+            self.stdout.write(self.style.WARNING("No photos found."))
+            return
+
+        engine = get_engine().load()
+        threshold = engine.threshold
+        full, fast = {}, {}
+        full_time = fast_time = 0.0
+        for path in photos:
+            started = time.perf_counter()
+            image = np.array(Image.open(path).convert('RGB'))
+            encodings = engine.embed(image, engine.detect(image))
+            full_time += time.perf_counter() - started
+
+            started = time.perf_counter()
+            encoding = compute_face_encoding(str(path))
+            fast_time += time.perf_counter() - started
+
+            if encodings:
+                full[path] = encodings[0]
+            if encoding is not None:
+                fast[path] = encoding
+
+        n = len(photos)
+        self.stdout.write(f"{n} photos, {engine.name} engine (max side {settings.FACE_IMAGE_MAX_SIDE}, detect {settings.FACE_DETECT_MAX_SIDE})")
+        self.stdout.write(f"  full resolution : {full_time / n * 1000:8.1f} ms/photo, faces found in {len(full)}")
+        self.stdout.write(f"  preprocessed    : {fast_time / n * 1000:8.1f} ms/photo, faces found in {len(fast)}")
+
+        both = [path for path in photos if path in full and path in fast]
+        if not both:
+            return
+
+        drift = [np.linalg.norm(full[path] - fast[path]) for path in both]
+        self.stdout.write(f"  embedding drift : mean {np.mean(drift):.3f}, max {np.max(drift):.3f}")
+
+        # Does the match/no-match decision change for any pair of photos?
+        agree = total = 0
+        for a, b in itertools.combinations(both, 2):
+            total += 1
+            agree += (np.linalg.norm(full[a] - full[b]) < threshold) == \
+                     (np.linalg.norm(fast[a] - fast[b]) < threshold)
+        if total:
+            self.stdout.write(f"  decision agreement on {total} pairs: {agree / total:.1%}")
@@ -0,0 +1,92 @@
+import math
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from geopy.distance import geodesic
+
+from core import geofence
+
+
+class Command(BaseCommand):
+    help = "Compare geofence checks (geodesic, planar, haversine, batched, building outlines) for speed and error."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=20000)
+        parser.add_argument('--lat', type=float, default=17.385)
+        parser.add_argument('--long', type=float, default=78.4867)
+        parser.add_argument('--radius', type=float, default=200.0)
+
+    def handle(self, *args, **options):
+        n, radius = options['points'], options['radius']
+        center = (options['lat'], options['long'])
+        rng = np.random.default_rng(0)
+        # scatter points out to 3x the radius so the bounding box gets work to do
+        per_lat, per_lon = geofence.metres_per_degree(center[0])
+        dist = rng.uniform(0, 3 * radius, n)
+        bearing = rng.uniform(0, 2 * math.pi, n)
+        lats = center[0] + dist * np.cos(bearing) / per_lat
+        lons = center[1] + dist * np.sin(bearing) / per_lon
+        points = list(zip(lats.tolist(), lons.tolist()))
+
+        exact = np.array([geodesic(p, center).meters for p in points])
+        planar = np.array([geofence.local_distance_m(p, center) for p in points])
+        haversine = geofence.haversine_m(lats, lons, *center)
+        near = exact <= 3 * radius
+        self.stdout.write(f"Max error vs geodesic within {3 * radius:.0f} m of ({center[0]}, {center[1]}):")
+        self.stdout.write(f"  planar     {np.abs(planar - exact)[near].max() * 1000:8.2f} mm")
+        self.stdout.write(f"  haversine  {np.abs(haversine - exact)[near].max() * 1000:8.2f} mm")
+
+        expected = exact <= radius
+        checks = {
+            'geodesic': lambda: [geodesic(p, center).meters <= radius for p in points],
+            'bbox + planar': lambda: [geofence.within_radius(p, center, radius, precise=False) for p in points],
+            'bbox + geodesic': lambda: [geofence.within_radius(p, center, radius, precise=True) for p in points],
+            'batched planar': lambda: geofence.within_radius_many(lats, lons, center, radius),
+        }
+        self.stdout.write(f"\nPer-point cost for {n} points, radius {radius:.0f} m:")
+        for name, check in checks.items():
+            started = time.perf_counter()
+            result = np.asarray(check())
+            elapsed = time.perf_counter() - started
+            disagree = int((result != expected).sum())
+            self.stdout.write(f"  {name:18} {elapsed / n * 1e6:8.2f} us   disagreements: {disagree}")
+
+        self.bench_polygon(center, rng)
+
+    def bench_polygon(self, center, rng, vertices=64, buildings=200):
+        # A ring of jagged building outlines, ~80 m across, laid out on a campus grid
+        per_lat, per_lon = geofence.metres_per_degree(center[0])
+        polygons = {}
+        for b in range(buildings):
+            row, col = divmod(b, 20)
+            c_lat, c_lon = center[0] + row * 150 / per_lat, center[1] + col * 150 / per_lon
+            angles = np.linspace(0, 2 * math.pi, vertices, endpoint=False)
+            radii = rng.uniform(25, 40, vertices)
+            outline = np.column_stack([c_lat + radii * np.cos(angles) / per_lat,
+                                       c_lon + radii * np.sin(angles) / per_lon])
+            polygons[b] = geofence.CompiledPolygon(outline)
+        grid = geofence.PolygonGrid(polygons)
+
+        n = 20000
+        lats = center[0] + rng.uniform(-50, 1500, n) / per_lat
+        lons = center[1] + rng.uniform(-50, 3000, n) / per_lon
+
+        def naive_locate(lat, lon):
+            # every polygon, every edge
+            found = []
+            for key, polygon in polygons.items():
+                inside = False
+                for lat1, lon1, lat2, lon2 in polygon.edges:
+                    if (lat1 > lat) != (lat2 > lat) and lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1) > lon:
+                        inside = not inside
+                if inside:
+                    found.append(key)
+            return found
+
+        self.stdout.write(f"\nBuilding lookup, {buildings} buildings x {vertices} vertices:")
+        for name, locate, count in [('grid + slabs', grid.locate, n), ('naive scan', naive_locate, n // 100)]:
+            started = time.perf_counter()
+            for lat, lon in zip(lats[:count], lons[:count]):
+                locate(lat, lon)
+            self.stdout.write(f"  {name:18} {(time.perf_counter() - started) / count * 1e6:8.2f} us")
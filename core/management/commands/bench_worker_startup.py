@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: start Django, import the views (what a web
+# worker does), serve one non-AI request, then report time and peak RSS
+CHILD = """
+import json, resource, time
+started = time.perf_counter()
+import django
+django.setup()
+import core.views
+from core.face_engine import get_engine
+ready = time.perf_counter() - started
+from django.test import Client
+Client().get('/login/')
+print(json.dumps({
+    'startup_s': ready,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'face_backend_loaded': get_engine().loaded,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Startup time and peak RSS of a web worker with the face backend loaded lazily vs warmed up."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        scenarios = [('lazy (default web worker)', '0'), ('warm-up (verification worker)', '1')]
+        self.stdout.write(f"{'':32} {'startup':>9} {'peak RSS':>10}  face backend")
+        for label, warmup in scenarios:
+            runs = [self.run_child(warmup) for _ in range(options['repeat'])]
+            startup = min(run['startup_s'] for run in runs)
+            rss = min(run['rss_mb'] for run in runs)
+            loaded = 'loaded' if runs[0]['face_backend_loaded'] else 'not loaded'
+            self.stdout.write(f"{label:32} {startup * 1000:7.0f}ms {rss:8.1f}MB  {loaded}")
+
+    def run_child(self, warmup):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'smart_attendance.settings'),
+            'FACE_ENGINE_WARMUP': warmup,
+        }
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.ann import build_campus_index
+
+
+class Command(BaseCommand):
+    help = "Re-train the campus-wide face search index from every stored embedding."
+
+    def handle(self, *args, **options):
+        index = build_campus_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index)} users in {len(index.centroids)} cells -> {settings.FACE_ANN_INDEX_PATH}"
+        ))
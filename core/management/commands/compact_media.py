@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.thumbnails import compact_media
+
+
+class Command(BaseCommand):
+    help = (
+        "Make missing profile/capture thumbnails, then retire full-size captures older than "
+        "the retention window (archive or delete). Run gc_media afterwards to free the files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.CAPTURE_RETENTION_DAYS,
+                            help="Keep full-size captures this many days (default: CAPTURE_RETENTION_DAYS).")
+        parser.add_argument('--action', choices=['archive', 'delete'], default=settings.CAPTURE_RETENTION_ACTION)
+        parser.add_argument('--workers', type=int, default=4, help="Thumbnail threads.")
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        result = compact_media(
+            retention_days=options['retention_days'],
+            action=options['action'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(
+            f"Thumbnails: {result.profile_thumbnails} profiles, {result.capture_thumbnails} captures "
+            f"({result.failed} failed)."
+        )
+        verb = "Archived" if options['action'] == 'archive' else "Dropped"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.expired} full-size captures ({result.archived_bytes / 1024 / 1024:.1f} MB archived)."
+        ))
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.enrollment import enroll_students, read_roster_csv, write_failure_report
+from core.models import Course
+
+
+class Command(BaseCommand):
+    help = (
+        "Create students from a CSV (username[,first_name,last_name,email,department,password,photo]) "
+        "and a directory of photos, computing face embeddings on all cores. Safe to rerun: "
+        "existing usernames are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('photos_dir')
+        parser.add_argument('--course', type=int, help="Also enroll everyone in this course id.")
+        parser.add_argument('--workers', type=int, help="Encoding processes (default: all cores).")
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--report', default='enrollment_failures.csv',
+                            help="Where to write the per-photo failure report.")
+
+    def handle(self, *args, **options):
+        course = None
+        if options['course'] is not None:
+            course = Course.objects.filter(pk=options['course']).first()
+            if course is None:
+                raise CommandError(f"No course with id {options['course']}.")
+        try:
+            rows = read_roster_csv(options['csv_path'], options['photos_dir'])
+            started = time.perf_counter()
+
+            def progress(result):
+                self.stdout.write(
+                    f"  {result.created} created, {result.skipped} already enrolled, "
+                    f"{len(result.failures)} failed ({time.perf_counter() - started:.0f}s)"
+                )
+
+            result = enroll_students(rows, course=course, workers=options['workers'],
+                                     chunk_size=options['chunk_size'], progress=progress)
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+
+        if result.failures:
+            write_failure_report(result.failures, options['report'])
+            self.stdout.write(self.style.WARNING(
+                f"{len(result.failures)} photos failed; see {options['report']}. "
+                "Fix them and rerun the same command."
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Enrolled {result.created} students ({result.skipped} already enrolled) "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,50 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import export_queryset, iter_csv, write_parquet
+
+
+class Command(BaseCommand):
+    help = "Export attendance records as CSV (streamed) or Parquet (needs pyarrow), in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help="Course id.")
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat, help="First day, YYYY-MM-DD.")
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help="Last day, YYYY-MM-DD.")
+        parser.add_argument('--department')
+        parser.add_argument('--status', help="e.g. PRESENT; all statuses by default.")
+        parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+        parser.add_argument('--output', '-o', help="Output file (CSV defaults to stdout).")
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        queryset = export_queryset(
+            course=options['course'],
+            date_from=options['date_from'],
+            date_to=options['date_to'],
+            department=options['department'],
+            status=options['status'],
+        )
+
+        if options['format'] == 'parquet':
+            if not options['output']:
+                raise CommandError("--output is required for Parquet.")
+            try:
+                rows = write_parquet(queryset, options['output'], options['chunk_size'])
+            except ImportError:
+                raise CommandError("Parquet export needs pyarrow (pip install pyarrow).")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {rows} rows to {options['output']}."))
+            return
+
+        rows = -1  # header
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                for line in iter_csv(queryset, options['chunk_size']):
+                    output.write(line)
+                    rows += 1
+        else:
+            for line in iter_csv(queryset, options['chunk_size']):
+                self.stdout.write(line, ending='')
+                rows += 1
+        self.stderr.write(self.style.SUCCESS(f"Exported {rows} rows."))
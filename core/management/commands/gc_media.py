@@ -0,0 +1,74 @@
+import os
+import time
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+
+
+def file_fields():
+    """(model, field) for every FileField/ImageField stored in default_storage."""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and field.storage is default_storage:
+                yield model, field
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete media files that no User, AttendanceRecord (or any other FileField) references. "
+        "Only the upload_to directories are scanned."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted.")
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help="Keep files younger than this (an upload may not have its row yet).")
+
+    def handle(self, *args, **options):
+        referenced = set()
+        directories = set()
+        for model, field in file_fields():
+            names = (
+                model._default_manager.exclude(**{f'{field.name}__isnull': True})
+                .exclude(**{field.name: ''})
+                .values_list(field.name, flat=True)
+            )
+            referenced.update(names.iterator())
+            if isinstance(field.upload_to, str) and field.upload_to:
+                directories.add(field.upload_to.strip('/'))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipping {model.__name__}.{field.name}: upload_to is not a plain directory."
+                ))
+
+        cutoff = time.time() - options['min_age_hours'] * 3600
+        purge = getattr(default_storage, 'purge', default_storage.delete)
+        removed = freed = kept = 0
+        for directory in sorted(directories):
+            root = default_storage.path(directory)
+            for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, default_storage.location).replace(os.sep, '/')
+                    if name in referenced:
+                        kept += 1
+                        continue
+                    stat = os.stat(path)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    removed += 1
+                    freed += stat.st_size
+                    if options['dry_run']:
+                        self.stdout.write(f"  would delete {name}")
+                    else:
+                        purge(name)
+                # Drop shard directories left empty
+                if not options['dry_run'] and dirpath != root and not os.listdir(dirpath):
+                    os.rmdir(dirpath)
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {removed} unreferenced files ({freed / 1024 / 1024:.1f} MB); {kept} referenced files kept."
+        ))
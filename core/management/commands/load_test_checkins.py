@@ -0,0 +1,154 @@
+import io
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.test.utils import override_settings
+from PIL import Image
+
+from core.models import AttendanceRecord, AttendanceSession, Course, User
+from core.verification import VerificationJob, finalize_batch
+
+
+def capture_bytes(size=(480, 640)):
+    """A real (if blank) selfie-sized JPEG, so finalization makes a real thumbnail."""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (120, 80, 60)).save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+CAPTURE_BYTES = capture_bytes()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test concurrent check-in writes on a scratch SQLite database: "
+        "rollback journal with one commit per record vs WAL with batched finalization."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkins', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--batch-size', type=int, default=settings.FACE_VERIFICATION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("This load test is for the SQLite backend.")
+
+        scenarios = [
+            ('rollback journal, per-record commits',
+             {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000}, {}, False),
+            ('WAL, IMMEDIATE, batched finalization',
+             {**settings.SQLITE_PRAGMAS, **settings.SQLITE_WAL_PRAGMAS},
+             settings.DATABASES['default'].get('OPTIONS', {}), True),
+        ]
+        self.stdout.write(
+            f"{options['checkins']} check-ins from {options['threads']} threads "
+            f"(insert PENDING, then finalize as PRESENT):"
+        )
+        for label, pragmas, db_options, batched in scenarios:
+            rate, errors = self.run_scenario(pragmas, db_options, batched, options)
+            self.stdout.write(f"  {label:40} {rate:8.1f} check-ins/s   'database is locked': {errors}")
+
+    def run_scenario(self, pragmas, db_options, batched, options):
+        scratch = Path(tempfile.mkdtemp(prefix='checkin-load-'))
+        original = connections.settings['default']
+        self.switch_database({**original, 'NAME': str(scratch / 'load.sqlite3'), 'OPTIONS': db_options})
+        try:
+            with override_settings(SQLITE_PRAGMAS=pragmas, MEDIA_ROOT=str(scratch / 'media')):
+                call_command('migrate', verbosity=0)
+                session, students = self.seed(options['checkins'])
+                return self.hammer(session, students, options['threads'], options['batch_size'], batched)
+        finally:
+            self.switch_database(original)
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def switch_database(self, settings_dict):
+        connections['default'].close()
+        del connections['default']
+        connections.settings['default'] = settings_dict
+
+    def seed(self, n):
+        faculty = User.objects.create(username='load_faculty', role='FACULTY')
+        course = Course.objects.create(name='Load test', faculty=faculty)
+        session = AttendanceSession.objects.create(course=course, latitude=0, longitude=0, duration_minutes=600)
+        students = User.objects.bulk_create(
+            [User(username=f'load_student_{i}', role='STUDENT', department='CSE') for i in range(n)],
+            batch_size=1000,
+        )
+        return session, students
+
+    def hammer(self, session, students, threads, batch_size, batched):
+        todo = queue.Queue()
+        for student in students:
+            todo.put(student)
+        finalize_queue = queue.Queue()
+        errors = []
+
+        def checkin_worker():
+            try:
+                while True:
+                    try:
+                        student = todo.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        record = AttendanceRecord(session=session, student=student, gps_lat=0, gps_long=0,
+                                                  status='PENDING')
+                        with transaction.atomic():
+                            record.save()
+                        job = VerificationJob(record.pk, 'capture.jpg', CAPTURE_BYTES, None)
+                        if batched:
+                            finalize_queue.put(job)
+                        else:
+                            finalize_batch([job], [True])
+                    except OperationalError as e:
+                        errors.append(e)
+            finally:
+                connections.close_all()
+
+        def finalizer(stop):
+            # Same shape as BatchVerifier: drain up to batch_size jobs, write them together
+            try:
+                while not (stop.is_set() and finalize_queue.empty()):
+                    try:
+                        batch = [finalize_queue.get(timeout=0.05)]
+                    except queue.Empty:
+                        continue
+                    while len(batch) < batch_size:
+                        try:
+                            batch.append(finalize_queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    try:
+                        finalize_batch(batch, [True] * len(batch))
+                    except OperationalError as e:
+                        errors.append(e)
+            finally:
+                connections.close_all()
+
+        stop = threading.Event()
+        finalizer_thread = threading.Thread(target=finalizer, args=(stop,))
+        if batched:
+            finalizer_thread.start()
+        started = time.perf_counter()
+        workers = [threading.Thread(target=checkin_worker) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stop.set()
+        if batched:
+            finalizer_thread.join()
+        elapsed = time.perf_counter() - started
+
+        present = AttendanceRecord.objects.filter(status='PRESENT').count()
+        connections['default'].close()
+        return present / elapsed, len(errors)
@@ -0,0 +1,156 @@
+# core/metrics.py
+"""
+In-process latency metrics.
+
+    with timed('stage', stage='detect'):
+        ...
+    observe('stage', 0.012, stage='encode')
+
+Every (family, labels) pair gets a LatencyHistogram: fixed log-spaced
+buckets, so memory stays constant however many requests are recorded, and
+p50/p95/p99 are read off the bucket counts (within ~10%). render_prometheus()
+writes them all out in the Prometheus text format (as summaries).
+
+Nothing here imports Django models, so the face worker processes can time
+their steps too: capture_timings() collects their samples and the web
+process merges them with record_samples().
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# family -> (Prometheus name, help text)
+FAMILIES = {
+    'request': ('smart_attendance_request_duration_seconds', "Time spent handling each HTTP request."),
+    'stage': ('smart_attendance_checkin_stage_duration_seconds', "Time spent in each step of the check-in pipeline."),
+}
+
+
+class LatencyHistogram:
+    # 0.1 ms .. ~100 s, four buckets per doubling
+    BOUNDS = [1e-4 * 2 ** (i / 4) for i in range(81)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)  # last bucket: above the top bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.BOUNDS):
+                    return self.max
+                upper = self.BOUNDS[i]
+                lower = self.BOUNDS[i - 1] if i else 0.0
+                # geometric interpolation inside the bucket
+                fraction = (rank - seen) / n
+                value = lower * (upper / lower) ** fraction if lower else upper * fraction
+                return min(value, self.max)
+            seen += n
+        return self.max
+
+
+_lock = threading.Lock()
+_histograms = {}  # (family, ((label, value), ...)) -> LatencyHistogram
+_captured = None  # list of samples while capture_timings() is running
+
+
+def observe(family, seconds, **labels):
+    key = (family, tuple(sorted(labels.items())))
+    if _captured is not None:
+        _captured.append((key, seconds))
+        return
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = LatencyHistogram()
+        histogram.observe(seconds)
+
+
+@contextmanager
+def timed(family, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(family, time.perf_counter() - started, **labels)
+
+
+def capture_timings(fn, *args, **kwargs):
+    """
+    Run fn and return (result, samples) instead of recording the samples here.
+    Used in worker processes, whose own histograms nobody would ever read.
+    """
+    global _captured
+    _captured = []
+    try:
+        result = fn(*args, **kwargs)
+        return result, _captured
+    finally:
+        _captured = None
+
+
+def record_samples(samples):
+    """Merge samples returned by capture_timings() into this process's histograms."""
+    for (family, labels), seconds in samples:
+        observe(family, seconds, **dict(labels))
+
+
+def snapshot():
+    """{(family, labels): {'count', 'sum', 'max', 'p50', 'p95', 'p99'}} in seconds."""
+    with _lock:
+        return {
+            key: {
+                'count': h.count,
+                'sum': h.sum,
+                'max': h.max,
+                **{f"p{round(q * 100)}": h.quantile(q) for q in QUANTILES},
+            }
+            for key, h in _histograms.items()
+        }
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def _format_labels(labels):
+    escaped = [(k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')) for k, v in labels]
+    return ','.join(f'{k}="{v}"' for k, v in escaped)
+
+
+def render_prometheus():
+    """All histograms as Prometheus text exposition (format 0.0.4)."""
+    with _lock:
+        items = sorted(_histograms.items())
+        lines = []
+        for family, (name, help_text) in FAMILIES.items():
+            series = [(labels, h) for (fam, labels), h in items if fam == family]
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for labels, h in series:
+                for q in QUANTILES:
+                    label_text = _format_labels([*labels, ('quantile', q)])
+                    lines.append(f"{name}{{{label_text}}} {h.quantile(q):.6g}")
+                base = f"{{{_format_labels(labels)}}}" if labels else ''
+                lines.append(f"{name}_sum{base} {h.sum:.6g}")
+                lines.append(f"{name}_count{base} {h.count}")
+    return '\n'.join(lines) + '\n'
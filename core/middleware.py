@@ -0,0 +1,19 @@
+# core/middleware.py
+import time
+
+from .metrics import observe
+
+
+class LatencyMiddleware:
+    """Record every request's duration, labelled by URL name and method (see core/metrics.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        observe('request', time.perf_counter() - started, view=view, method=request.method)
+        return response
@@ -0,0 +1,14 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_attendancerecord_captured_image'),
+        ('core', '0004_user_department'),
+    ]
+
+    operations = [
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_merge_20261018_1655'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='face_embedding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='face_embedding_source',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='face_embedding_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_face_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='students',
+            field=models.ManyToManyField(blank=True, limit_choices_to={'role': 'STUDENT'}, related_name='enrolled_courses', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
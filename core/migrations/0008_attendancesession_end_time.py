@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:45
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def fill_end_time(apps, schema_editor):
+    AttendanceSession = apps.get_model('core', 'AttendanceSession')
+    for session in AttendanceSession.objects.all().iterator():
+        session.end_time = session.start_time + timedelta(minutes=session.duration_minutes)
+        session.save(update_fields=['end_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_course_students'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancesession',
+            name='end_time',
+            field=models.DateTimeField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_end_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendancesession',
+            name='end_time',
+            field=models.DateTimeField(db_index=True, editable=False),
+        ),
+    ]
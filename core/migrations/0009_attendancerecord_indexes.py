@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+def mark_duplicate_checkins(apps, schema_editor):
+    # Older check-ins could record a student twice in one session; keep the
+    # first live row of each pair and reject the rest (REJECTED rows are
+    # outside the unique constraint, and views and rollups already ignore them).
+    AttendanceRecord = apps.get_model('core', 'AttendanceRecord')
+    seen = set()
+    duplicates = []
+    live = AttendanceRecord.objects.filter(status__in=['PENDING', 'PRESENT']).order_by('timestamp', 'id')
+    for record_id, session_id, student_id in live.values_list('id', 'session_id', 'student_id').iterator():
+        if (session_id, student_id) in seen:
+            duplicates.append(record_id)
+        seen.add((session_id, student_id))
+    AttendanceRecord.objects.filter(id__in=duplicates).update(status='REJECTED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_attendancesession_end_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_duplicate_checkins, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', '-timestamp'], name='record_student_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['session', '-timestamp'], name='record_session_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['PENDING', 'PRESENT'])), fields=('session', 'student'), name='one_checkin_per_session'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_rollups(apps, schema_editor):
+    AttendanceRecord = apps.get_model('core', 'AttendanceRecord')
+    DailyAttendance = apps.get_model('core', 'DailyAttendance')
+    rows = (
+        AttendanceRecord.objects.filter(status='PRESENT')
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'session__course_id', 'student__department')
+        .annotate(present=Count('id'))
+        .order_by()
+    )
+    DailyAttendance.objects.bulk_create([
+        DailyAttendance(
+            date=row['day'],
+            course_id=row['session__course_id'],
+            department=row['student__department'] or '',
+            present=row['present'],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_attendancerecord_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('department', models.CharField(blank=True, default='', max_length=50)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='rollup_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'course', 'department'), name='one_rollup_per_day_course_department')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_campus_buildings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='captured_thumbnail',
+            field=models.ImageField(blank=True, default='', editable=False, upload_to='thumbnails/captures/'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, default='', editable=False, upload_to='thumbnails/profiles/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='face_embedding_engine',
+            field=models.CharField(blank=True, default='dlib', editable=False, max_length=20),
+        ),
+    ]
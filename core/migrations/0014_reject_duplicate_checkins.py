@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:40
+
+from django.db import migrations
+
+
+def reject_duplicate_checkins(apps, schema_editor):
+    # Earlier versions of 0009 marked duplicate check-ins with a 'DUPLICATE'
+    # status that nothing else knows about; 0009 now uses REJECTED
+    AttendanceRecord = apps.get_model('core', 'AttendanceRecord')
+    AttendanceRecord.objects.filter(status='DUPLICATE').update(status='REJECTED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_face_embedding_engine'),
+    ]
+
+    operations = [
+        migrations.RunPython(reject_duplicate_checkins, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
@@ -14,6 +15,8 @@ class User(AbstractUser):
     
     # Visual ID (Uploaded by user)
     profile_image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Small copy of profile_image served to pages and APIs (core/thumbnails.py)
+    profile_thumbnail = models.ImageField(upload_to='thumbnails/profiles/', blank=True, default='', editable=False)
 
     # Department (AIML, CSE, ECE, DS, MECH)
     department = models.CharField(max_length=50, blank=True, null=True)
@@ -23,27 +26,112 @@ class User(AbstractUser):
     
     device_id = models.CharField(max_length=100, blank=True, null=True)
 
+    # Face embedding of the reference photo (128 float64 values), computed once on upload
+    face_embedding = models.BinaryField(blank=True, null=True, editable=False)
+    # Name of the image the embedding was computed from (changes => recompute)
+    face_embedding_source = models.CharField(max_length=255, blank=True, default='', editable=False)
+    # Bumped every time the embedding is recomputed
+    face_embedding_version = models.PositiveIntegerField(default=0, editable=False)
+    # Face engine that produced the embedding (engines' vectors aren't comparable)
+    face_embedding_engine = models.CharField(max_length=20, blank=True, default='dlib', editable=False)
+
+    @property
+    def face_reference(self):
+        """The image used for face checks: the profile photo first, then the live scan."""
+        return self.profile_image or self.reference_image
+
 # 2. Course Model
 class Course(models.Model):
     name = models.CharField(max_length=100)
     faculty = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'FACULTY'})
+    # Enrolled students (the roster used by kiosk check-in)
+    students = models.ManyToManyField(User, related_name='enrolled_courses', blank=True, limit_choices_to={'role': 'STUDENT'})
+
+    def __str__(self):
+        return self.name
+
+# Campus geofences: each building has a polygon outline (see core/campus.py)
+class Campus(models.Model):
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        verbose_name_plural = 'campuses'
 
     def __str__(self):
         return self.name
 
+
+class Building(models.Model):
+    campus = models.ForeignKey(Campus, on_delete=models.CASCADE, related_name='buildings')
+    name = models.CharField(max_length=100)
+    # Block code sent by the faculty "start session" form (e.g. "A", "Main")
+    block = models.CharField(max_length=20)
+    # [[lat, long], ...] corners, in order around the building
+    outline = models.JSONField()
+    # GPS slack around the outline
+    margin_meters = models.PositiveIntegerField(default=15)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['campus', 'block'], name='unique_block_per_campus'),
+        ]
+
+    def clean(self):
+        super().clean()
+        try:
+            points = [(float(lat), float(lon)) for lat, lon in self.outline]
+        except (TypeError, ValueError):
+            raise ValidationError({'outline': "Enter a list of [latitude, longitude] pairs."})
+        if len(points) < 3:
+            raise ValidationError({'outline': "An outline needs at least three corners."})
+        if any(not (-90 <= lat <= 90 and -180 <= lon <= 180) for lat, lon in points):
+            raise ValidationError({'outline': "Latitudes must be within ±90 and longitudes within ±180."})
+
+    @property
+    def center(self):
+        lats = [point[0] for point in self.outline]
+        longs = [point[1] for point in self.outline]
+        return sum(lats) / len(lats), sum(longs) / len(longs)
+
+    def __str__(self):
+        return f"{self.name} ({self.campus.name})"
+
 # 3. Attendance Session
+class AttendanceSessionQuerySet(models.QuerySet):
+    def active(self):
+        """Sessions still running, filtered in SQL on the indexed end_time."""
+        return self.filter(end_time__gt=timezone.now())
+
+
 class AttendanceSession(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     start_time = models.DateTimeField(auto_now_add=True)
     duration_minutes = models.IntegerField(default=10)
+    # start_time + duration, stored so "active" can be answered by the database
+    end_time = models.DateTimeField(db_index=True, editable=False)
     latitude = models.FloatField()
     longitude = models.FloatField()
     radius_meters = models.IntegerField(default=200)
+    # When set, the building outline is the geofence instead of the circle
+    building = models.ForeignKey(Building, on_delete=models.SET_NULL, null=True, blank=True)
+    room_no = models.CharField(max_length=20, blank=True, default='')
     topic = models.CharField(max_length=200, default="General Class")
 
+    objects = AttendanceSessionQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        if self.start_time is None:
+            self.start_time = timezone.now()
+        self.end_time = self.start_time + timedelta(minutes=self.duration_minutes)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'duration_minutes' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'end_time'}
+        super().save(*args, **kwargs)
+
     @property
     def is_active(self):
-        return timezone.now() < self.start_time + timedelta(minutes=self.duration_minutes)
+        return timezone.now() < self.end_time
 
     def __str__(self):
         return f"{self.course.name} ({self.start_time.date()})"
@@ -54,6 +142,43 @@ class AttendanceRecord(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'STUDENT'})
     timestamp = models.DateTimeField(auto_now_add=True)
     captured_image = models.ImageField(upload_to='attendance_captures/', null=True, blank=True)
+    # Kept after the full-size capture is retired (CAPTURE_RETENTION_DAYS)
+    captured_thumbnail = models.ImageField(upload_to='thumbnails/captures/', blank=True, default='', editable=False)
     gps_lat = models.FloatField()
     gps_long = models.FloatField()
-    status = models.CharField(max_length=20, default='PRESENT')
\ No newline at end of file
+    status = models.CharField(max_length=20, default='PRESENT')
+
+    class Meta:
+        indexes = [
+            # Cooldown check: a student's latest record
+            models.Index(fields=['student', '-timestamp'], name='record_student_time_idx'),
+            # Faculty live table: a session's records, newest first
+            models.Index(fields=['session', '-timestamp'], name='record_session_time_idx'),
+        ]
+        constraints = [
+            # One live check-in per student per session, enforced by the database
+            models.UniqueConstraint(
+                fields=['session', 'student'],
+                condition=models.Q(status__in=['PENDING', 'PRESENT']),
+                name='one_checkin_per_session',
+            ),
+        ]
+# 5. Daily Attendance Rollup (per day / course / department)
+# Kept up to date as check-ins become PRESENT (see core/rollups.py), so stats
+# never have to scan AttendanceRecord.
+class DailyAttendance(models.Model):
+    date = models.DateField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    department = models.CharField(max_length=50, blank=True, default='')
+    present = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'course', 'department'], name='one_rollup_per_day_course_department'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='rollup_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.course.name} {self.department or '-'}: {self.present}"
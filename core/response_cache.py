@@ -0,0 +1,84 @@
+# core/response_cache.py
+"""
+Cached responses for read-mostly JSON endpoints.
+
+Responses are stored in Django's cache with an ETag and a TTL. When the
+client sends a matching If-None-Match, the answer is 304 with no body.
+Entries are dropped by the post_save/post_delete handlers in core/signals.py
+as soon as the underlying data changes.
+"""
+import hashlib
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def stats():
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return {**_stats, 'hit_ratio': round(_stats['hits'] / lookups, 4) if lookups else 0.0}
+
+
+def cache_key(namespace, user_id=None):
+    return f"response:{namespace}" if user_id is None else f"response:{namespace}:{user_id}"
+
+
+def invalidate(namespace, user_id=None):
+    cache.delete(cache_key(namespace, user_id))
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')]
+
+
+def cached_json(namespace, per_user=False, timeout=None):
+    """
+    Cache a JSON view's 200 responses under `namespace` (one entry per user if
+    per_user=True) and answer conditional requests with 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if per_user and not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            key = cache_key(namespace, request.user.pk if per_user else None)
+            entry = cache.get(key)
+            if entry is None:
+                _count('misses')
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+                entry = (response.content, response['Content-Type'], etag)
+                cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT if timeout is None else timeout)
+            else:
+                _count('hits')
+
+            content, content_type, etag = entry
+            if _etag_matches(request, etag):
+                _count('not_modified')
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(content, content_type=content_type)
+            response['ETag'] = etag
+            # Let the browser keep a copy but always revalidate it with the ETag
+            patch_cache_control(response, private=True, no_cache=True)
+            if per_user:
+                patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,80 @@
+# core/rollups.py
+"""
+Incremental attendance rollups.
+
+Every time check-ins become PRESENT, the matching DailyAttendance rows
+(date, course, department) are bumped with an F() update. home_stats_api
+reads these small rows instead of counting AttendanceRecord, so its cost
+does not grow with the record table.
+
+The date is the local date of the check-in's timestamp, not of the moment it
+was verified. PRESENT records that are deleted or saved with another status
+are taken back out (core/signals.py). Queryset updates bypass those signals;
+after editing records in bulk, run `manage.py rebuild_attendance_rollups`.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AttendanceRecord, AttendanceSession, DailyAttendance, User
+from .response_cache import invalidate
+
+
+def record_day(record):
+    """The rollup date of a check-in: the local date it was made."""
+    return timezone.localdate(record.timestamp) if record.timestamp else timezone.localdate()
+
+
+def count_present(session, departments, day=None):
+    """Add newly PRESENT students (given by their departments) to the rollup."""
+    day = day or timezone.localdate()
+    for department, n in Counter(d or '' for d in departments).items():
+        with transaction.atomic():
+            row, _ = DailyAttendance.objects.get_or_create(
+                date=day, course_id=session.course_id, department=department
+            )
+            DailyAttendance.objects.filter(pk=row.pk).update(present=F('present') + n)
+    # queryset updates send no post_save, so drop the cached stats here
+    invalidate('home_stats')
+
+
+def uncount_present(record):
+    """Take a record that is no longer PRESENT (deleted or changed) out of the rollup."""
+    course_id = AttendanceSession.objects.filter(pk=record.session_id).values_list('course_id', flat=True).first()
+    if course_id is None:
+        return  # the course is being deleted, and its rollup rows with it
+    department = User.objects.filter(pk=record.student_id).values_list('department', flat=True).first()
+    DailyAttendance.objects.filter(
+        date=record_day(record), course_id=course_id, department=department or '', present__gt=0,
+    ).update(present=F('present') - 1)
+    invalidate('home_stats')
+
+
+def rebuild_rollups():
+    """Recompute every rollup row from AttendanceRecord (one grouped query)."""
+    rows = (
+        AttendanceRecord.objects.filter(status='PRESENT')
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'session__course_id', 'student__department')
+        .annotate(present=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        DailyAttendance.objects.all().delete()
+        DailyAttendance.objects.bulk_create(
+            [
+                DailyAttendance(
+                    date=row['day'],
+                    course_id=row['session__course_id'],
+                    department=row['student__department'] or '',
+                    present=row['present'],
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+    invalidate('home_stats')
+    return DailyAttendance.objects.count()
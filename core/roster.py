@@ -0,0 +1,108 @@
+# core/roster.py
+"""
+1:N identification against a course roster (kiosk check-in).
+
+Each course's enrolled-student embeddings are stacked into one (n, 128)
+matrix and kept in memory, so matching every face in a frame against the
+whole roster is a single vectorized distance computation.
+"""
+import hashlib
+
+import numpy as np
+from django.conf import settings
+
+from .cache import LRUCache
+from .embeddings import EMBEDDING_SIZE, decode_embedding
+from .face_engine import get_engine
+from .metrics import timed
+from .utils import match_threshold
+
+
+class RosterIndex:
+    def __init__(self, user_ids, matrix):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.matrix = np.asarray(matrix, dtype=np.float64).reshape(-1, EMBEDDING_SIZE)
+        self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+
+    @property
+    def nbytes(self):
+        return self.user_ids.nbytes + self.matrix.nbytes + self.sq_norms.nbytes
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def distances(self, probes):
+        """(faces, students) euclidean distance matrix via |p|^2 + |m|^2 - 2 p.m"""
+        probes = np.asarray(probes, dtype=np.float64).reshape(-1, EMBEDDING_SIZE)
+        with timed('stage', stage='distance'):
+            sq = (np.einsum('ij,ij->i', probes, probes)[:, None] + self.sq_norms[None, :]
+                  - 2.0 * probes @ self.matrix.T)
+            return np.sqrt(np.maximum(sq, 0.0))
+
+    def identify(self, probes, threshold=None):
+        """
+        Best roster match for each probe: list of (user_id or None, distance).
+        A student is assigned to at most one face (the closest one).
+        """
+        n_probes = len(probes)
+        if n_probes == 0 or len(self) == 0:
+            return [(None, None)] * n_probes
+
+        dist = self.distances(probes)
+        best = dist.argmin(axis=1)
+        return assign_matches(self.user_ids[best], dist[np.arange(n_probes), best], threshold)
+
+
+def assign_matches(best_ids, best_dist, threshold=None):
+    """
+    Turn each probe's nearest user into a match, keeping only matches under the
+    threshold (default: the face engine's) and giving each user to at most one
+    face (the closest one).
+    """
+    threshold = match_threshold() if threshold is None else threshold
+    results = [(None, float(d) if np.isfinite(d) else None) for d in best_dist]
+    claimed = set()
+    for i in np.argsort(best_dist):
+        if best_dist[i] >= threshold:
+            break
+        user_id = int(best_ids[i])
+        if user_id in claimed:
+            continue
+        claimed.add(user_id)
+        results[i] = (user_id, float(best_dist[i]))
+    return results
+
+
+def build_roster(students):
+    rows = [
+        (user_id, decode_embedding(data))
+        for user_id, data in (
+            students.exclude(face_embedding=None)
+            .filter(face_embedding_engine=get_engine().name)
+            .values_list('id', 'face_embedding')
+        )
+    ]
+    if not rows:
+        return RosterIndex([], np.empty((0, EMBEDDING_SIZE)))
+    user_ids, vectors = zip(*rows)
+    return RosterIndex(user_ids, np.vstack(vectors))
+
+
+roster_cache = LRUCache(
+    max_entries=settings.ROSTER_CACHE_MAX_COURSES,
+    max_bytes=settings.ROSTER_CACHE_MAX_BYTES,
+)
+
+
+def get_course_roster(course):
+    """
+    The in-memory roster matrix for a course. The cache key includes the face
+    engine and a digest of every enrolled (id, embedding version) pair, so
+    any worker sees enrolment, photo or engine changes without cross-process
+    invalidation. Two integers per student are far cheaper to read than the
+    embeddings themselves.
+    """
+    students = course.students.all()
+    pairs = np.asarray(students.order_by('id').values_list('id', 'face_embedding_version'), dtype=np.int64)
+    key = (course.pk, get_engine().name, hashlib.blake2b(pairs.tobytes(), digest_size=16).hexdigest())
+    return roster_cache.get_or_set(key, lambda: build_roster(students))
@@ -0,0 +1,84 @@
+# core/signals.py
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .ann import schedule_campus_update
+from .embeddings import refresh_face_embedding
+from .models import AttendanceRecord, AttendanceSession, User
+from .response_cache import invalidate
+from .rollups import count_present, record_day, uncount_present
+from .thumbnails import refresh_profile_thumbnail
+
+
+# Recompute the face embedding whenever a new reference photo is saved
+# (signup_view, the admin, or anything else that saves a User)
+@receiver(post_save, sender=User, dispatch_uid='core_refresh_face_embedding')
+def update_face_embedding(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if refresh_face_embedding(instance):
+        # Keep the campus-wide search index in step (see core/ann.py)
+        schedule_campus_update(instance.pk)
+        # The old thumbnail shows the previous photo
+        refresh_profile_thumbnail(instance)
+
+
+@receiver(post_delete, sender=User, dispatch_uid='core_remove_from_campus_index')
+def remove_from_campus_index(sender, instance, **kwargs):
+    schedule_campus_update(instance.pk)
+
+
+# Drop cached JSON responses (see core/response_cache.py) when their data changes
+@receiver([post_save, post_delete], sender=User, dispatch_uid='core_invalidate_user_responses')
+def invalidate_user_responses(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return  # every login saves last_login; nothing cached depends on it
+    invalidate('current_user', instance.pk)
+    invalidate('home_stats')
+
+
+@receiver([post_save, post_delete], sender=AttendanceSession, dispatch_uid='core_invalidate_session_responses')
+@receiver([post_save, post_delete], sender=AttendanceRecord, dispatch_uid='core_invalidate_record_responses')
+def invalidate_attendance_responses(sender, **kwargs):
+    invalidate('home_stats')
+
+
+# Keep the DailyAttendance rollups right when a record stops (or starts) being
+# PRESENT outside the check-in paths, e.g. in the admin (see core/rollups.py)
+@receiver(pre_save, sender=AttendanceRecord, dispatch_uid='core_remember_record_status')
+def remember_record_status(sender, instance, raw=False, **kwargs):
+    instance._saved_status = None
+    if not raw and not instance._state.adding:
+        instance._saved_status = (
+            AttendanceRecord.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=AttendanceRecord, dispatch_uid='core_rollup_status_change')
+def update_rollup_on_status_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_saved_status', None)
+    if created or raw or previous is None or previous == instance.status:
+        return
+    if previous == 'PRESENT':
+        uncount_present(instance)
+    elif instance.status == 'PRESENT':
+        count_present(instance.session, [instance.student.department], day=record_day(instance))
+
+
+@receiver(post_delete, sender=AttendanceRecord, dispatch_uid='core_rollup_record_deleted')
+def uncount_deleted_record(sender, instance, **kwargs):
+    if instance.status == 'PRESENT':
+        uncount_present(instance)
+
+
+# SQLite write concurrency: a busy timeout on every connection, plus WAL and
+# relaxed fsync when SQLITE_WAL=1 (see settings.SQLITE_PRAGMAS)
+@receiver(connection_created, dispatch_uid='core_sqlite_pragmas')
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,82 @@
+# core/storage.py
+"""
+Content-addressed media storage.
+
+A file is stored under its upload_to directory at a path derived from the
+SHA-256 of its bytes, sharded two levels deep:
+
+    profiles/3f/a2/3fa2c1...e9.jpeg
+
+Uploading the same bytes again returns the existing name instead of writing
+a copy with a random suffix. Because one file can then back several rows,
+delete() leaves the bytes in place; `manage.py gc_media` removes files that
+no row references any more.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHARS = 40  # hex digits of the SHA-256 kept in the name (160 bits)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save; never add suffixes
+        return name
+
+    def content_name(self, name, digest):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4], digest[:HASH_CHARS] + ext).replace('\\', '/')
+
+    def _save(self, name, content):
+        directory = self.path(os.path.dirname(name))
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+
+        # Hash while copying to a temp file, then move it to its content name
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            final_name = self.content_name(name, digest.hexdigest())
+            final_path = self.path(final_name)
+            try:
+                # Same bytes already stored. Touch the file so gc_media's grace
+                # period covers it until the row referencing it is saved.
+                os.utime(final_path)
+            except FileNotFoundError:
+                pass  # not stored yet (or collected just now): write it below
+            else:
+                os.remove(tmp_path)
+                return final_name
+
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            # Atomic; if a concurrent upload of the same bytes won, this
+            # replaces identical content
+            os.replace(tmp_path, final_path)
+            return final_name
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, name):
+        """Shared content: left for gc_media, which checks every reference first."""
+
+    def purge(self, name):
+        """Really remove the file (used by gc_media)."""
+        super().delete(name)
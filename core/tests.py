@@ -1,3 +1,1263 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.db.models import Sum
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from geopy.distance import geodesic
+from PIL import Image, ImageOps
+
+from . import ann, enrollment, metrics
+from .ann import IVFIndex, update_campus_users
+from .cache import LRUCache
+from .campus import build_building_index, find_building, inside_building
+from .enrollment import enroll_students, read_roster_csv
+from .embeddings import decode_embedding, embedding_is_stale, encode_embedding, get_reference_embedding
+from .face_engine import create_engine, get_engine
+from .geofence import (
+    CompiledPolygon, PolygonGrid, local_distance_m, outside_bounding_box, within_radius, within_radius_many,
+)
+from .models import AttendanceRecord, AttendanceSession, Building, Campus, Course, DailyAttendance, User
+from .rollups import count_present, rebuild_rollups
+from .serializers import AttendanceSerializer
+from .roster import build_roster, get_course_roster, roster_cache
+from .thumbnails import compact_media
+from .utils import detect_faces, prepare_face_image
+from . import verification, views
+from .verification import BatchVerifier, VerificationJob, finalize_batch
+from .views import DUPLICATE_CHECKIN_ERROR, MarkAttendanceView, check_session_active, save_checkin
+
+
+def setUpModule():
+    # Never touch the developer's face_index.npz: every test module run gets its own
+    global index_dir, index_override
+    index_dir = tempfile.mkdtemp()
+    index_override = override_settings(FACE_ANN_INDEX_PATH=os.path.join(index_dir, 'face_index.npz'))
+    index_override.enable()
+
+
+def tearDownModule():
+    index_override.disable()
+    shutil.rmtree(index_dir)
+
+
+class TempMediaMixin:
+    """Each test gets an empty MEDIA_ROOT (self.media), removed afterwards."""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.use_settings(MEDIA_ROOT=self.media)
+
+    def use_settings(self, **overrides):
+        """Settings overridden until the end of this test."""
+        override = self.settings(**overrides)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class FacultyDashboardQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = User.objects.create_user('prof', password='pw', role='FACULTY')
+        cls.course = Course.objects.create(name='Machine Learning', faculty=cls.faculty)
+        cls.session = AttendanceSession.objects.create(course=cls.course, latitude=17.385, longitude=78.4867)
+
+    def add_checkins(self, count):
+        start = User.objects.count()
+        students = User.objects.bulk_create(
+            [User(username=f'student{start + i}', role='STUDENT') for i in range(count)]
+        )
+        AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(session=self.session, student=student, gps_lat=17.385, gps_long=78.4867)
+            for student in students
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.faculty)
+
+    def get_dashboard(self):
+        return self.client.get(reverse('faculty_dashboard'))
+
+    def test_query_count_is_constant(self):
+        # auth session + user, active session, records (with students joined), feed cursor
+        self.add_checkins(5)
+        with self.assertNumQueries(5):
+            response = self.get_dashboard()
+        self.assertEqual(response.context['student_count'], 5)
+
+        self.add_checkins(400)
+        with self.assertNumQueries(5):
+            response = self.get_dashboard()
+        self.assertEqual(response.context['student_count'], 405)
+        self.assertContains(response, 'student404')
+
+    @override_settings(FACULTY_DASHBOARD_MAX_RECORDS=10)
+    def test_capped_list_keeps_exact_count(self):
+        self.add_checkins(25)
+        with self.assertNumQueries(6):
+            response = self.get_dashboard()
+        self.assertEqual(len(response.context['records']), 10)
+        self.assertEqual(response.context['student_count'], 25)
+        self.assertTrue(response.context['records_truncated'])
+
+    def test_only_present_rows_are_listed(self):
+        self.add_checkins(3)
+        AttendanceRecord.objects.filter(student__username='student1').update(status='REJECTED')
+        response = self.get_dashboard()
+        self.assertEqual(response.context['student_count'], 2)
+
+
+class LiveAttendanceFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = User.objects.create_user('prof', password='pw', role='FACULTY')
+        course = Course.objects.create(name='Machine Learning', faculty=cls.faculty)
+        cls.session = AttendanceSession.objects.create(course=course, latitude=17.385, longitude=78.4867)
+        cls.students = [User.objects.create_user(f'student{i}', role='STUDENT') for i in range(3)]
+
+    def setUp(self):
+        self.client.force_login(self.faculty)
+
+    def checkin(self, student, status='PRESENT'):
+        return AttendanceRecord.objects.create(
+            session=self.session, student=student, gps_lat=17.385, gps_long=78.4867, status=status
+        )
+
+    def poll(self, after, recheck=()):
+        response = self.client.get(reverse('live-attendance'), {
+            'session': self.session.id, 'after': after, 'recheck': ','.join(map(str, recheck)),
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_returns_only_new_checkins(self):
+        first = self.checkin(self.students[0])
+        data = self.poll(0)
+        self.assertEqual([r['id'] for r in data['records']], [first.id])
+
+        second = self.checkin(self.students[1])
+        data = self.poll(data['cursor'])
+        self.assertEqual([r['id'] for r in data['records']], [second.id])
+        self.assertEqual(self.poll(data['cursor'])['records'], [])
+
+    def test_pending_checkin_is_not_skipped(self):
+        pending = self.checkin(self.students[0], status='PENDING')
+        present = self.checkin(self.students[1])
+        data = self.poll(0)
+        self.assertEqual(data['cursor'], present.id)
+        self.assertEqual(data['pending'], [pending.id])
+
+        data = self.poll(data['cursor'], data['pending'])
+        self.assertEqual((data['records'], data['pending']), ([], [pending.id]))
+        AttendanceRecord.objects.filter(pk=pending.pk).update(status='PRESENT')
+        data = self.poll(data['cursor'], data['pending'])
+        self.assertEqual([r['id'] for r in data['records']], [pending.id])
+        self.assertEqual(data['pending'], [])
+
+    @override_settings(LIVE_FEED_PAGE_SIZE=2)
+    def test_pages_past_a_pending_checkin(self):
+        students = [User.objects.create_user(f'extra{i}', role='STUDENT') for i in range(6)]
+        pending = self.checkin(self.students[0], status='PENDING')
+        present = [self.checkin(student).id for student in students]
+        seen, cursor, recheck = [], 0, []
+        for _ in range(4):
+            data = self.poll(cursor, recheck)
+            seen += [r['id'] for r in data['records']]
+            cursor, recheck = data['cursor'], data['pending']
+        self.assertEqual(seen, present)
+        self.assertEqual(recheck, [pending.id])
+
+    def test_other_faculty_cannot_read_feed(self):
+        other = User.objects.create_user('other', role='FACULTY')
+        self.client.force_login(other)
+        response = self.client.get(reverse('live-attendance'), {'session': self.session.id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_bad_parameters_are_rejected(self):
+        for params in ({'session': 'abc'}, {'session': self.session.id, 'after': 'x'}):
+            self.assertEqual(self.client.get(reverse('live-attendance'), params).status_code, 400)
+
+
+class HomeStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_roles_and_reads_rollups(self):
+        faculty = User.objects.create_user('prof', role='FACULTY')
+        User.objects.create_user('admin', role='ADMIN')
+        students = [User.objects.create_user(f'student{i}', role='STUDENT', department='CSE') for i in range(3)]
+        course = Course.objects.create(name='Machine Learning', faculty=faculty)
+        session = AttendanceSession.objects.create(course=course, latitude=17.385, longitude=78.4867)
+        count_present(session, [s.department for s in students[:2]] + ['AIML'])
+
+        # one grouped role count, one per-day sum, one per-department sum
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse('home-stats')).json()
+
+        self.assertEqual((data['students'], data['faculty'], data['admins']), (3, 1, 1))
+        self.assertEqual(data['attendance'][-1], 3)
+        self.assertEqual(data['departments'], {'AIML': 1, 'CSE': 2})
+
+    def test_rebuild_matches_incremental_rollups(self):
+        faculty = User.objects.create_user('prof', role='FACULTY')
+        student = User.objects.create_user('student', role='STUDENT', department='ECE')
+        course = Course.objects.create(name='Signals', faculty=faculty)
+        session = AttendanceSession.objects.create(course=course, latitude=17.385, longitude=78.4867)
+        AttendanceRecord.objects.create(session=session, student=student, gps_lat=17.385, gps_long=78.4867)
+        count_present(session, [student.department])
+
+        before = list(DailyAttendance.objects.values_list('date', 'course', 'department', 'present'))
+        rebuild_rollups()
+        self.assertEqual(list(DailyAttendance.objects.values_list('date', 'course', 'department', 'present')), before)
+
+
+class RollupMaintenanceTests(TestCase):
+    def setUp(self):
+        faculty = User.objects.create_user('prof', role='FACULTY')
+        self.student = User.objects.create_user('student', role='STUDENT', department='ECE')
+        self.session = AttendanceSession.objects.create(
+            course=Course.objects.create(name='Signals', faculty=faculty), latitude=17.385, longitude=78.4867
+        )
+        self.record = AttendanceRecord.objects.create(
+            session=self.session, student=self.student, gps_lat=17.385, gps_long=78.4867
+        )
+        count_present(self.session, [self.student.department])
+
+    def present(self):
+        counted = DailyAttendance.objects.aggregate(n=Sum('present'))['n'] or 0
+        rebuilt = AttendanceRecord.objects.filter(status='PRESENT').count()
+        self.assertEqual(counted, rebuilt)
+        return counted
+
+    def test_status_changes_are_counted_both_ways(self):
+        self.record.status = 'REJECTED'
+        self.record.save()
+        self.assertEqual(self.present(), 0)
+        self.record.status = 'PRESENT'
+        self.record.save()
+        self.assertEqual(self.present(), 1)
+
+    def test_deleted_record_is_uncounted(self):
+        self.record.delete()
+        self.assertEqual(self.present(), 0)
+        AttendanceRecord.objects.create(
+            session=self.session, student=self.student, gps_lat=17.385, gps_long=78.4867, status='REJECTED'
+        ).delete()
+        self.assertEqual(self.present(), 0)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', role='STUDENT')
+        self.client.force_login(self.user)
+
+    def test_second_request_is_served_from_cache(self):
+        self.client.get(reverse('home-stats'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home-stats'))
+        self.assertEqual(response.json()['students'], 1)
+
+    def test_matching_etag_returns_304(self):
+        response = self.client.get(reverse('current-user'))
+        etag = response['ETag']
+
+        response = self.client.get(reverse('current-user'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_save_invalidates_cached_payload(self):
+        etag = self.client.get(reverse('current-user'))['ETag']
+        self.user.first_name = 'Asha'
+        self.user.save()
+
+        response = self.client.get(reverse('current-user'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Asha')
+
+    def test_users_do_not_share_entries(self):
+        self.client.get(reverse('current-user'))
+        other = User.objects.create_user('faculty', role='FACULTY')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('current-user')).json()['username'], 'faculty')
+
+
+class RadiusGeofenceTests(TestCase):
+    CENTER = (17.3850, 78.4867)
+
+    def around(self, distance_m, bearings=range(0, 360, 45)):
+        return [tuple(geodesic(meters=distance_m).destination(self.CENTER, bearing))[:2] for bearing in bearings]
+
+    def test_matches_geodesic_at_classroom_radii(self):
+        for radius in (25, 100, 500):
+            for point in self.around(radius * 0.5) + self.around(radius - 0.1):
+                self.assertTrue(within_radius(point, self.CENTER, radius), (radius, point))
+            for point in self.around(radius + 0.1) + self.around(radius * 1.5):
+                self.assertFalse(within_radius(point, self.CENTER, radius), (radius, point))
+        for point in self.around(500):
+            self.assertAlmostEqual(local_distance_m(point, self.CENTER), geodesic(point, self.CENTER).meters, delta=0.01)
+
+    def test_precise_mode_uses_geodesic(self):
+        point = self.around(99.9)[3]
+        with mock.patch('core.geofence.geodesic', wraps=geodesic) as precise:
+            self.assertTrue(within_radius(point, self.CENTER, 100))
+            precise.assert_not_called()
+            with self.settings(GEOFENCE_PRECISE=True):
+                self.assertTrue(within_radius(point, self.CENTER, 100))
+            self.assertFalse(within_radius(self.around(100.1)[3], self.CENTER, 100, precise=True))
+        self.assertEqual(precise.call_count, 2)
+
+    def test_bounding_box_rejects_before_any_distance(self):
+        far = self.around(1000, bearings=[0, 90, 180, 270])
+        for point in far:
+            self.assertTrue(outside_bounding_box(point, self.CENTER, 100))
+        # The box corner is outside the circle, so the box alone must not accept it
+        corner = self.around(100 * 2 ** 0.5 - 1, bearings=[45])[0]
+        self.assertFalse(outside_bounding_box(corner, self.CENTER, 100))
+        self.assertFalse(within_radius(corner, self.CENTER, 100))
+        with mock.patch('core.geofence.local_distance_m') as distance, \
+                mock.patch('core.geofence.geodesic') as precise:
+            for point in far:
+                self.assertFalse(within_radius(point, self.CENTER, 100))
+                self.assertFalse(within_radius(point, self.CENTER, 100, precise=True))
+        distance.assert_not_called()
+        precise.assert_not_called()
+
+    def test_vectorized_matches_scalar(self):
+        rng = np.random.default_rng(0)
+        lats = self.CENTER[0] + rng.uniform(-0.003, 0.003, 500)  # about +-330 m
+        lons = self.CENTER[1] + rng.uniform(-0.003, 0.003, 500)
+        inside = within_radius_many(lats, lons, self.CENTER, 150)
+        self.assertTrue(0 < inside.sum() < len(inside))
+        self.assertEqual(inside.tolist(), [within_radius((lat, lon), self.CENTER, 150) for lat, lon in zip(lats, lons)])
+
+
+class BuildingGeofenceTests(TestCase):
+    # An L-shaped block, roughly 100 m on a side
+    OUTLINE = [[17.3850, 78.4860], [17.3859, 78.4860], [17.3859, 78.4865],
+               [17.3855, 78.4865], [17.3855, 78.4869], [17.3850, 78.4869]]
+
+    def test_point_in_polygon(self):
+        polygon = CompiledPolygon(self.OUTLINE)
+        self.assertTrue(polygon.contains(17.3852, 78.4867))   # foot of the L
+        self.assertTrue(polygon.contains(17.3857, 78.4862))   # upright
+        self.assertFalse(polygon.contains(17.3857, 78.4867))  # the notch
+        self.assertFalse(polygon.contains(17.3900, 78.4862))
+
+    def test_margin_accepts_gps_drift(self):
+        # ~10 m east of the east wall
+        outside = (17.3852, 78.4869 + 10 / CompiledPolygon(self.OUTLINE).per_lon)
+        self.assertFalse(CompiledPolygon(self.OUTLINE).contains(*outside))
+        self.assertTrue(CompiledPolygon(self.OUTLINE, margin_m=15).contains(*outside))
+
+    def test_grid_locates_building(self):
+        other = [[p[0] + 0.01, p[1]] for p in self.OUTLINE]
+        grid = PolygonGrid({'main': CompiledPolygon(self.OUTLINE), 'annex': CompiledPolygon(other)})
+        self.assertEqual(grid.locate(17.3852, 78.4867), ['main'])
+        self.assertEqual(grid.locate(17.3952, 78.4867), ['annex'])
+        self.assertEqual(grid.locate(17.3905, 78.4867), [])
+
+    def test_faculty_session_uses_block(self):
+        faculty = User.objects.create_user('prof', role='FACULTY')
+        Course.objects.create(name='Machine Learning', faculty=faculty)
+        campus = Campus.objects.create(name='Main Campus')
+        building = Building.objects.create(campus=campus, name='A Block', block='A', outline=self.OUTLINE)
+        self.client.force_login(faculty)
+        self.client.post(reverse('faculty_dashboard'), {'duration': 10, 'block': 'a', 'room_no': '204'})
+
+        session = AttendanceSession.objects.get()
+        self.assertEqual((session.building, session.room_no), (building, '204'))
+        self.assertAlmostEqual(session.latitude, building.center[0])
+
+    def test_clean_rejects_bad_outline(self):
+        campus = Campus.objects.create(name='Main Campus')
+        for outline in ([[17.385, 78.486], [17.386, 78.486]], [[17.385, 'east']], [[95, 78.486]] * 3):
+            with self.assertRaises(ValidationError):
+                Building(campus=campus, name='A Block', block='A', outline=outline).full_clean()
+        Building(campus=campus, name='A Block', block='A', outline=self.OUTLINE).full_clean()
+
+    def test_bad_outline_is_skipped(self):
+        campus = Campus.objects.create(name='Main Campus')
+        good = Building.objects.create(campus=campus, name='A Block', block='A', outline=self.OUTLINE)
+        bad = Building.objects.create(campus=campus, name='B Block', block='B', outline=[[17.385, 78.486]])
+        with self.assertLogs('core.campus', 'WARNING'):
+            index = build_building_index()
+            self.assertEqual(list(index.polygons), [good.pk])
+            self.assertTrue(inside_building(good.pk, 17.3852, 78.4867))
+            self.assertIsNone(inside_building(bad.pk, 17.3852, 78.4867))
+
+        faculty = User.objects.create_user('prof', role='FACULTY')
+        Course.objects.create(name='Machine Learning', faculty=faculty)
+        self.client.force_login(faculty)
+        response = self.client.post(reverse('faculty_dashboard'), {'duration': 10, 'block': 'B'})
+        self.assertContains(response, 'no usable outline')
+        self.assertFalse(AttendanceSession.objects.exists())
+
+    def test_block_is_scoped_to_campus(self):
+        main = Campus.objects.create(name='Main Campus')
+        north = Campus.objects.create(name='North Campus')
+        Building.objects.create(campus=main, name='A Block', block='A', outline=self.OUTLINE)
+        other = [[p[0] + 0.01, p[1]] for p in self.OUTLINE]
+        north_a = Building.objects.create(campus=north, name='A Block', block='A', outline=other)
+        self.assertEqual(find_building('a', 'north campus'), north_a)
+        self.assertEqual(find_building('a', north.pk), north_a)
+        self.assertIsNone(find_building('Z', north.pk))
+        with self.assertRaises(Building.MultipleObjectsReturned):
+            find_building('a')
+
+        faculty = User.objects.create_user('prof', role='FACULTY')
+        Course.objects.create(name='Machine Learning', faculty=faculty)
+        self.client.force_login(faculty)
+        response = self.client.post(reverse('faculty_dashboard'), {'duration': 10, 'block': 'A'})
+        self.assertContains(response, 'more than one campus')
+        self.assertFalse(AttendanceSession.objects.exists())
+        self.client.post(reverse('faculty_dashboard'), {'duration': 10, 'block': 'A', 'campus': north.pk})
+        self.assertEqual(AttendanceSession.objects.get().building, north_a)
+
+
+class AttendanceSessionTimingTests(TestCase):
+    def setUp(self):
+        self.start = timezone.now().replace(microsecond=0)
+        course = Course.objects.create(name='Machine Learning', faculty=User.objects.create_user('prof', role='FACULTY'))
+        with mock.patch('django.utils.timezone.now', return_value=self.start):
+            self.session = AttendanceSession.objects.create(course=course, latitude=17.385, longitude=78.4867)
+
+    def active_at(self, moment):
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            self.session.refresh_from_db()
+            return list(AttendanceSession.objects.active()), self.session.is_active
+
+    def test_active_until_end_time(self):
+        self.assertEqual(self.session.end_time, self.start + timedelta(minutes=10))
+        self.assertEqual(self.active_at(self.start + timedelta(minutes=10) - timedelta(microseconds=1)),
+                         ([self.session], True))
+        self.assertEqual(self.active_at(self.start + timedelta(minutes=10)), ([], False))
+
+    def test_extending_with_update_fields_moves_end_time(self):
+        self.session.duration_minutes = 30
+        self.session.save(update_fields=['duration_minutes'])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.end_time, self.start + timedelta(minutes=30))
+        self.assertEqual(self.active_at(self.start + timedelta(minutes=20)), ([self.session], True))
+
+
+class AttendanceExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = User.objects.create_user('prof', role='FACULTY')
+        cls.course = Course.objects.create(name='Machine Learning', faculty=faculty)
+        other = Course.objects.create(name='Signals', faculty=faculty)
+        session = AttendanceSession.objects.create(course=cls.course, latitude=17.385, longitude=78.4867)
+        other_session = AttendanceSession.objects.create(course=other, latitude=17.385, longitude=78.4867)
+        for i, department in enumerate(['CSE', 'CSE', 'ECE']):
+            student = User.objects.create_user(f'student{i}', role='STUDENT', department=department)
+            AttendanceRecord.objects.create(session=session, student=student, gps_lat=17.385, gps_long=78.4867)
+            AttendanceRecord.objects.create(session=other_session, student=student, gps_lat=17.385, gps_long=78.4867)
+        cls.admin = User.objects.create_user('admin', role='ADMIN', is_staff=True)
+
+    def export(self, **params):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('attendance-export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_filters_by_course_and_department(self):
+        rows = self.export(course=self.course.id, department='CSE')
+        self.assertEqual([(r['student'], r['course']) for r in rows],
+                         [('student0', 'Machine Learning'), ('student1', 'Machine Learning')])
+        self.assertEqual(len(self.export()), 6)
+
+    def test_rejects_bad_dates_and_non_staff(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('attendance-export'), {'from': '2026-02-30'}).status_code, 400)
+        self.client.force_login(User.objects.get(username='student0'))
+        self.assertEqual(self.client.get(reverse('attendance-export')).status_code, 403)
+
+    def test_command_writes_csv(self):
+        out = io.StringIO()
+        call_command('export_attendance', '--department', 'ECE', '--chunk-size', '1', stdout=out, stderr=io.StringIO())
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(out.getvalue())))), 2)
+
+
+class LatencyMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_quantiles_from_buckets(self):
+        histogram = metrics.LatencyHistogram()
+        for ms in range(1, 1001):
+            histogram.observe(ms / 1000)
+        self.assertAlmostEqual(histogram.quantile(0.5), 0.5, delta=0.05)
+        self.assertAlmostEqual(histogram.quantile(0.99), 0.99, delta=0.1)
+        self.assertEqual(histogram.count, 1000)
+
+    def test_worker_samples_are_merged(self):
+        def work():
+            metrics.observe('stage', 0.02, stage='encode')
+            return 'done'
+
+        result, samples = metrics.capture_timings(work)
+        self.assertEqual(result, 'done')
+        self.assertEqual(metrics.snapshot(), {})
+        metrics.record_samples(samples)
+        self.assertEqual(metrics.snapshot()[('stage', (('stage', 'encode'),))]['count'], 1)
+
+    def test_endpoint_is_staff_only_prometheus_text(self):
+        user = User.objects.create_user('student', role='STUDENT')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        self.client.get(reverse('home-stats'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE smart_attendance_request_duration_seconds summary', body)
+        self.assertIn('smart_attendance_request_duration_seconds_count{method="GET",view="home-stats"} 1', body)
+
+
+class ContentAddressedStorageTests(TempMediaMixin, TestCase):
+    def test_identical_uploads_share_one_file(self):
+        first = default_storage.save('profiles/akhi.jpeg', ContentFile(b'same bytes'))
+        second = default_storage.save('profiles/akhi.jpeg', ContentFile(b'same bytes'))
+        other = default_storage.save('profiles/akhi.jpeg', ContentFile(b'other bytes'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^profiles/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{40}\.jpeg$')
+        with default_storage.open(first) as f:
+            self.assertEqual(f.read(), b'same bytes')
+
+    def test_gc_removes_only_unreferenced_files(self):
+        user = User.objects.create_user('student', role='STUDENT')
+        user.profile_image.save('me.jpg', ContentFile(b'kept'), save=False)
+        User.objects.filter(pk=user.pk).update(profile_image=user.profile_image.name)
+        orphan = default_storage.save('attendance_captures/c.jpg', ContentFile(b'orphan'))
+
+        call_command('gc_media', '--min-age-hours', '0', stdout=io.StringIO())
+        self.assertTrue(default_storage.exists(user.profile_image.name))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(os.path.exists(os.path.dirname(default_storage.path(orphan))))
+
+    def test_reupload_protects_old_orphan_from_gc(self):
+        # An orphan past the grace period, then uploaded again for a row not saved yet
+        name = default_storage.save('attendance_captures/c.jpg', ContentFile(b'again'))
+        old = time.time() - 48 * 3600
+        os.utime(default_storage.path(name), (old, old))
+        self.assertEqual(default_storage.save('attendance_captures/d.jpg', ContentFile(b'again')), name)
+
+        call_command('gc_media', stdout=io.StringIO())
+        self.assertTrue(default_storage.exists(name))
+
+
+def jpeg_bytes(size=(1200, 900)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (120, 80, 60)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class MediaCompactionTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_settings(CAPTURE_ARCHIVE_ROOT=os.path.join(self.media, 'archive'))
+        cache.clear()
+
+        faculty = User.objects.create_user('prof', role='FACULTY')
+        course = Course.objects.create(name='Machine Learning', faculty=faculty)
+        self.session = AttendanceSession.objects.create(course=course, latitude=17.385, longitude=78.4867)
+        self.student = User.objects.create_user('student', role='STUDENT')
+
+    def add_capture(self, age_days):
+        name = default_storage.save('attendance_captures/c.jpg', ContentFile(jpeg_bytes()))
+        record = AttendanceRecord.objects.create(
+            session=self.session, student=self.student, gps_lat=17.385, gps_long=78.4867, captured_image=name
+        )
+        AttendanceRecord.objects.filter(pk=record.pk).update(timestamp=timezone.now() - timedelta(days=age_days))
+        return record, name
+
+    def test_thumbnails_then_archive_old_captures(self):
+        old, old_name = self.add_capture(age_days=40)
+        # free the one-check-in slot for the second record
+        AttendanceRecord.objects.filter(pk=old.pk).update(status='REJECTED')
+        recent, _ = self.add_capture(age_days=1)
+
+        result = compact_media(retention_days=30, action='archive', workers=2, chunk_size=1)
+        self.assertEqual((result.capture_thumbnails, result.expired), (2, 1))
+
+        old.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertFalse(old.captured_image)
+        self.assertTrue(recent.captured_image)
+        self.assertTrue(os.path.exists(os.path.join(self.media, 'archive', old_name)))
+        with default_storage.open(old.captured_thumbnail.name) as f:
+            self.assertLessEqual(max(Image.open(f).size), 160)
+
+    def test_current_user_serves_thumbnail(self):
+        self.student.profile_image.save('me.jpg', ContentFile(jpeg_bytes()))
+        self.client.force_login(self.student)
+        url = self.client.get(reverse('current-user')).json()['profile_image']
+        self.assertIn('/thumbnails/profiles/', url)
+
+
+class FaceImagePreprocessingTests(TestCase):
+    def jpeg(self, image, **save_kwargs):
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', **save_kwargs)
+        buffer.seek(0)
+        return buffer
+
+    def test_exif_rotation_is_applied(self):
+        # Stored sideways (400x200: red left half, blue right half); EXIF 6 = rotate 90 clockwise to view
+        image = Image.new('RGB', (400, 200), (0, 0, 255))
+        image.paste((255, 0, 0), (0, 0, 200, 200))
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        prepared = prepare_face_image(self.jpeg(image, exif=exif))
+        self.assertEqual(prepared.shape, (400, 200, 3))
+        self.assertGreater(prepared[50, 100, 0], 200)   # top is the red half
+        self.assertGreater(prepared[350, 100, 2], 200)  # bottom is the blue half
+
+    def test_large_jpeg_is_decoded_small(self):
+        source = self.jpeg(Image.new('RGB', (4000, 3000), (120, 80, 60)))
+        decoded = []
+        exif_transpose = ImageOps.exif_transpose
+
+        def record_decoded_size(image):
+            decoded.append(image.size)
+            return exif_transpose(image)
+
+        with mock.patch('core.utils.ImageOps.exif_transpose', side_effect=record_decoded_size):
+            prepared = prepare_face_image(source)
+        # libjpeg decoded at 1/2 scale (the smallest one >= 800 px), not the full 12 MP
+        self.assertEqual(decoded, [(2000, 1500)])
+        self.assertEqual(prepared.shape, (600, 800, 3))
+
+    def test_boxes_are_scaled_back_to_full_size(self):
+        engine = mock.Mock(detect_mode='L')
+        engine.detect.return_value = [(10, 60, 50, 20), (280, 410, 310, -5)]
+        image = np.zeros((1200, 1600, 3), dtype=np.uint8)
+        boxes = detect_faces(image, detect_side=400, engine=engine)
+        small = engine.detect.call_args.args[0]
+        self.assertEqual(small.shape, (300, 400))  # a quarter size, grayscale for HOG
+        self.assertEqual(boxes, [(40, 240, 200, 80), (1120, 1600, 1200, 0)])
+
+    def test_small_images_are_not_upscaled(self):
+        engine = mock.Mock(detect_mode='RGB')
+        engine.detect.return_value = [(10, 60, 50, 20)]
+        boxes = detect_faces(np.zeros((200, 300, 3), dtype=np.uint8), detect_side=400, engine=engine)
+        self.assertEqual(engine.detect.call_args.args[0].shape, (200, 300, 3))
+        self.assertEqual(boxes, [(10, 60, 50, 20)])
+
+
+class FaceEngineTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user('student', role='STUDENT')
+        User.objects.filter(pk=self.student.pk).update(face_embedding=encode_embedding(np.zeros(128)))
+        self.student.refresh_from_db()
+        self.students = User.objects.filter(pk=self.student.pk)
+
+    def test_engine_comes_from_settings(self):
+        self.assertEqual(get_engine().name, 'dlib')
+        with self.settings(FACE_ENGINE='opencv'):
+            self.assertEqual(get_engine().name, 'opencv')
+            self.assertFalse(get_engine().loaded)
+        with self.assertRaises(ImproperlyConfigured):
+            create_engine('nope')
+
+    def test_embeddings_from_another_engine_are_not_used(self):
+        self.assertFalse(embedding_is_stale(self.student))
+        self.assertEqual(len(build_roster(self.students)), 1)
+        with self.settings(FACE_ENGINE='opencv'):
+            self.assertTrue(embedding_is_stale(self.student))
+            self.assertEqual(len(build_roster(self.students)), 0)
+
+    def test_web_modules_do_not_load_a_backend(self):
+        script = (
+            "import sys, django; django.setup(); "
+            "import core.views, core.verification, core.enrollment_worker, smart_attendance.urls; "
+            "print(sorted({'face_recognition', 'dlib', 'cv2'} & set(sys.modules)))"
+        )
+        env = {name: value for name, value in os.environ.items() if name != 'FACE_ENGINE_WARMUP'}
+        result = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_opencv_models_are_not_run_concurrently(self):
+        import cv2
+        running, overlaps = [0], []
+
+        def forward(*args):
+            running[0] += 1
+            overlaps.append(running[0])
+            time.sleep(0.01)
+            running[0] -= 1
+            return np.ones((1, 128), dtype=np.float32)
+
+        engine = create_engine('opencv')
+        engine.cv2, engine._loaded = cv2, True
+        engine.detect_lock, engine.recognize_lock = threading.Lock(), threading.Lock()
+        engine.detector = mock.Mock(detect=mock.Mock(return_value=(0, None)))
+        engine.recognizer = mock.Mock(feature=mock.Mock(side_effect=forward))
+        image = np.zeros((64, 64, 3), dtype=np.uint8)
+        threads = [threading.Thread(target=engine.embed, args=(image, [(8, 56, 56, 8)])) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(overlaps), max(overlaps)), (4, 1))
+
+
+class CheckInTestMixin(TempMediaMixin):
+    """A student with a reference photo and an active session; the face step is mocked per test."""
+
+    def setUp(self):
+        super().setUp()
+
+        faculty = User.objects.create_user('prof', role='FACULTY')
+        self.course = Course.objects.create(name='Machine Learning', faculty=faculty)
+        self.session = AttendanceSession.objects.create(course=self.course, latitude=17.385, longitude=78.4867)
+        self.student = User.objects.create_user('student', role='STUDENT', department='AIML')
+        # queryset update with a matching source: the embedding counts as current, nothing is computed
+        User.objects.filter(pk=self.student.pk).update(
+            profile_image='profiles/me.jpg', face_embedding_source='profiles/me.jpg'
+        )
+        self.student.refresh_from_db()
+        self.client.force_login(self.student)
+
+        patcher = mock.patch('core.views.get_reference_embedding', return_value=np.zeros(128))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_checkin(self, lat=17.385):
+        return self.client.post(reverse('mark-attendance'), {
+            'session': self.session.pk, 'gps_lat': lat, 'gps_long': 78.4867,
+            'captured_image': SimpleUploadedFile('c.jpg', jpeg_bytes((64, 64)), 'image/jpeg'),
+        })
+
+
+@override_settings(FACE_VERIFICATION_ASYNC=False)
+class CheckInPipelineTests(CheckInTestMixin, TestCase):
+    @mock.patch('core.views.check_face_match', return_value=True)
+    def test_match_is_marked_present(self, face_match):
+        response = self.post_checkin()
+        self.assertEqual(response.status_code, 201)
+        record = AttendanceRecord.objects.get()
+        self.assertEqual(record.status, 'PRESENT')
+        self.assertTrue(record.captured_thumbnail)
+        self.assertEqual(DailyAttendance.objects.get().present, 1)
+
+    @mock.patch('core.views.check_face_match', return_value=True)
+    def test_cheap_stages_reject_before_the_face_check(self, face_match):
+        response = self.post_checkin(lat=18.0)
+        self.assertEqual(response.json(), {'error': 'Out of range'})
+        face_match.assert_not_called()
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    @mock.patch('core.views.check_face_match', return_value=False)
+    def test_mismatch_is_rejected_without_a_record(self, face_match):
+        response = self.post_checkin()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Face not recognized', response.json()['error'])
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_save_checkin_returns_none_for_a_concurrent_duplicate(self):
+        data = {'session': self.session.pk, 'gps_lat': 17.385, 'gps_long': 78.4867,
+                'captured_image': SimpleUploadedFile('c.jpg', jpeg_bytes((64, 64)), 'image/jpeg')}
+        serializer = AttendanceSerializer(data=data)
+        self.assertTrue(serializer.is_valid())
+        fields = {'student': self.student, 'session': self.session, 'status': 'PRESENT'}
+        self.assertIsNotNone(save_checkin(serializer, **fields))
+        self.assertIsNone(save_checkin(serializer, **fields))
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+
+@mock.patch('core.signals.schedule_campus_update')
+class ReferenceEmbeddingTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = User.objects.create_user('student', role='STUDENT')
+
+    def set_photo(self, content):
+        self.student.profile_image.save('me.jpg', ContentFile(content))
+
+    def test_embedding_follows_the_reference_photo(self, update_index):
+        with mock.patch('core.embeddings.compute_face_encoding', return_value=np.ones(128)) as encode:
+            self.set_photo(jpeg_bytes((64, 64)))
+            self.student.save()  # unchanged photo: nothing to recompute
+        self.assertEqual(encode.call_count, 1)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.face_embedding_version, 1)
+        self.assertEqual(decode_embedding(self.student.face_embedding).tolist(), [1.0] * 128)
+        self.assertFalse(embedding_is_stale(self.student))
+        update_index.assert_called_once()
+
+        with mock.patch('core.embeddings.compute_face_encoding', return_value=np.full(128, 2.0)):
+            self.set_photo(jpeg_bytes((80, 80)))
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.face_embedding_version, 2)
+        self.assertEqual(get_reference_embedding(self.student)[0], 2.0)
+
+    def test_photo_without_a_face_stores_no_embedding(self, update_index):
+        with mock.patch('core.embeddings.compute_face_encoding', return_value=None):
+            self.set_photo(jpeg_bytes((64, 64)))
+        self.student.refresh_from_db()
+        self.assertIsNone(self.student.face_embedding)
+        self.assertIsNone(get_reference_embedding(self.student))
+
+
+class LRUCacheTests(TestCase):
+    def make_cache(self, max_entries=3, max_bytes=100):
+        return LRUCache(max_entries=max_entries, max_bytes=max_bytes, sizeof=len)
+
+    def test_evicts_least_recently_used_by_count(self):
+        cache = self.make_cache()
+        for key in 'abc':
+            cache.set(key, 'x')
+        cache.get('a')  # 'b' is now the oldest
+        cache.set('d', 'x')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'x')
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_byte_accounting(self):
+        cache = self.make_cache(max_entries=10, max_bytes=10)
+        cache.set('a', 'x' * 4)
+        cache.set('b', 'x' * 4)
+        cache.set('a', 'x' * 2)  # replacing an entry frees its old size
+        self.assertEqual(cache.stats()['bytes'], 6)
+        cache.set('c', 'x' * 6)  # 12 bytes > 10: the oldest ('b') goes
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['bytes'], 8)
+        cache.set('huge', 'x' * 11)  # larger than the whole cache: not stored
+        self.assertIsNone(cache.get('huge'))
+        cache.discard('a')
+        self.assertEqual(cache.stats()['bytes'], 6)
+
+    def test_get_or_set_loads_once(self):
+        cache = self.make_cache()
+        loader = mock.Mock(return_value='v')
+        self.assertEqual(cache.get_or_set('k', loader), 'v')
+        self.assertEqual(cache.get_or_set('k', loader), 'v')
+        loader.assert_called_once()
+        self.assertEqual(cache.stats()['hit_ratio'], 0.5)
+
+
+@override_settings(FACE_VERIFICATION_ASYNC=False)
+@mock.patch('core.views.check_face_match', return_value=True)
+class DuplicateCheckInTests(CheckInTestMixin, TestCase):
+    def add_record(self, status):
+        return AttendanceRecord.objects.create(
+            session=self.session, student=self.student, gps_lat=17.385, gps_long=78.4867, status=status
+        )
+
+    def test_constraint_rejects_duplicate_that_passed_the_fast_path(self, face_match):
+        # As if a concurrent request inserted its row after this one's checks ran
+        self.add_record('PRESENT')
+        with mock.patch.object(MarkAttendanceView, 'stages', [check_session_active]):
+            response = self.post_checkin()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': DUPLICATE_CHECKIN_ERROR})
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_rejected_attempt_does_not_block_a_retry(self, face_match):
+        self.add_record('REJECTED')
+        AttendanceRecord.objects.update(timestamp=timezone.now() - timedelta(hours=2))
+        response = self.post_checkin()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AttendanceRecord.objects.filter(status='PRESENT').count(), 1)
+
+    def test_old_duplicate_status_is_migrated_to_rejected(self, face_match):
+        migration = importlib.import_module('core.migrations.0014_reject_duplicate_checkins')
+        duplicate = self.add_record('DUPLICATE')
+        migration.reject_duplicate_checkins(django_apps, None)
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.status, 'REJECTED')
+
+
+@override_settings(FACE_VERIFICATION_ASYNC=True)
+@mock.patch('core.views.submit_verification')
+class AsyncVerificationTests(CheckInTestMixin, TestCase):
+    def queue_checkin(self, submit):
+        response = self.post_checkin()
+        self.assertEqual(response.status_code, 202)
+        record, image_bytes, image_name, known_encoding = submit.call_args.args
+        self.assertEqual(record.status, 'PENDING')
+        return record, VerificationJob(record.pk, image_name, image_bytes, known_encoding)
+
+    def get_status(self, record):
+        return self.client.get(reverse('attendance-status', args=[record.pk])).json()
+
+    def test_match_becomes_present(self, submit):
+        record, job = self.queue_checkin(submit)
+        with mock.patch('time.sleep') as sleep:
+            response = self.client.get(reverse('attendance-status', args=[record.pk]), {'wait': 10})
+        sleep.assert_not_called()  # answers at once, the client does the waiting
+        self.assertEqual(response.json()['status'], 'PENDING')
+        self.assertEqual(response['Retry-After'], '1')
+
+        finalize_batch([job], [True])
+        payload = self.get_status(record)
+        self.assertEqual((payload['status'], payload['class_name']), ('PRESENT', 'Machine Learning'))
+        record.refresh_from_db()
+        self.assertTrue(record.captured_image)
+        self.assertEqual(DailyAttendance.objects.get().present, 1)
+
+    def test_verified_after_midnight_counts_for_the_checkin_day(self, submit):
+        record, job = self.queue_checkin(submit)
+        yesterday = timezone.now() - timedelta(days=1)
+        AttendanceRecord.objects.filter(pk=record.pk).update(timestamp=yesterday)
+        finalize_batch([job], [True])
+        self.assertEqual(DailyAttendance.objects.get().date, timezone.localdate(yesterday))
+
+    def test_mismatch_becomes_rejected(self, submit):
+        record, job = self.queue_checkin(submit)
+        finalize_batch([job], [False])
+        self.assertEqual(self.get_status(record)['status'], 'REJECTED')
+        self.assertFalse(DailyAttendance.objects.exists())
+
+    def test_lost_pending_row_does_not_block_the_student(self, submit):
+        lost = AttendanceRecord.objects.create(
+            session=self.session, student=self.student, gps_lat=17.385, gps_long=78.4867, status='PENDING'
+        )
+        AttendanceRecord.objects.filter(pk=lost.pk).update(timestamp=timezone.now() - timedelta(minutes=10))
+        with self.assertLogs('core.verification', 'WARNING'):
+            self.queue_checkin(submit)
+        lost.refresh_from_db()
+        self.assertEqual(lost.status, 'REJECTED')
+
+    def queue_other_student(self):
+        other = User.objects.create_user('other', role='STUDENT', department='CSE')
+        record = AttendanceRecord.objects.create(
+            session=self.session, student=other, gps_lat=17.385, gps_long=78.4867, status='PENDING'
+        )
+        return record, VerificationJob(record.pk, 'o.jpg', jpeg_bytes((64, 64)), None)
+
+    def test_reaped_row_does_not_sink_the_batch(self, submit):
+        record, job = self.queue_checkin(submit)
+        other, other_job = self.queue_other_student()
+
+        def reap_and_retry(image):
+            # While the batch is being finalized: the row is reaped and the student checks in again
+            if AttendanceRecord.objects.filter(pk=record.pk, status='PENDING').update(status='REJECTED'):
+                AttendanceRecord.objects.create(session=self.session, student=self.student,
+                                                gps_lat=17.385, gps_long=78.4867, status='PENDING')
+            return ''
+
+        with mock.patch('core.verification.capture_thumbnail', side_effect=reap_and_retry):
+            finalize_batch([job, other_job], [True, True])
+        other.refresh_from_db()
+        record.refresh_from_db()
+        self.assertEqual((other.status, record.status), ('PRESENT', 'REJECTED'))
+        self.assertEqual(DailyAttendance.objects.get().department, 'CSE')
+
+    def test_conflicting_row_keeps_the_other_verdicts(self, submit):
+        record, job = self.queue_checkin(submit)
+        other, other_job = self.queue_other_student()
+        with mock.patch.object(AttendanceRecord.objects, 'bulk_update', side_effect=IntegrityError):
+            finalize_batch([job, other_job], [True, False])
+        record.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((record.status, other.status), ('PRESENT', 'REJECTED'))
+        self.assertTrue(record.captured_image)
+
+    def test_broken_pool_is_replaced(self, submit):
+        broken, fresh = mock.Mock(), mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool()
+        self.addCleanup(setattr, verification, '_executor', None)
+        verification._executor = broken
+        with mock.patch('core.verification.ProcessPoolExecutor', return_value=fresh), \
+                mock.patch('core.verification.start_reaper'):
+            BatchVerifier(batch_size=1, window=0).dispatch([VerificationJob(1, 'c.jpg', b'', None)])
+        broken.shutdown.assert_called_once()
+        fresh.submit.assert_called_once()
+        self.assertIs(verification._executor, fresh)
+
+    def test_batch_is_spread_over_the_workers(self, submit):
+        verifier = BatchVerifier(batch_size=16, window=0, workers=4)
+        jobs = [VerificationJob(i, 'c.jpg', b'', None) for i in range(10)]
+        self.assertEqual([len(part) for part in verifier.split(jobs)], [3, 3, 3, 1])
+        self.assertEqual([len(part) for part in verifier.split(jobs[:2])], [1, 1])
+
+
+class CourseRosterCacheTests(TestCase):
+    def setUp(self):
+        roster_cache.clear()
+        self.addCleanup(roster_cache.clear)
+        self.course = Course.objects.create(name='Machine Learning', faculty=User.objects.create_user('prof', role='FACULTY'))
+        self.students = [User.objects.create_user(f'student{i}', role='STUDENT') for i in range(4)]
+        User.objects.filter(role='STUDENT').update(face_embedding=encode_embedding(np.zeros(128)))
+
+    def roster_ids(self):
+        return sorted(get_course_roster(self.course).user_ids.tolist())
+
+    def test_same_sized_enrolment_swap_is_seen(self):
+        # Same count and the same sum of ids before and after
+        first, second, third, fourth = self.students
+        self.course.students.set([second, third])
+        self.assertEqual(self.roster_ids(), [second.pk, third.pk])
+        self.course.students.set([first, fourth])
+        self.assertEqual(self.roster_ids(), [first.pk, fourth.pk])
+
+    def test_engine_switch_is_seen(self):
+        self.course.students.set(self.students)
+        self.assertEqual(len(self.roster_ids()), 4)
+        with self.settings(FACE_ENGINE='opencv'):
+            self.assertEqual(self.roster_ids(), [])
+
+
+class KioskAttendanceTests(TestCase):
+    def setUp(self):
+        self.faculty = User.objects.create_user('prof', role='FACULTY')
+        self.course = Course.objects.create(name='Machine Learning', faculty=self.faculty)
+        self.session = AttendanceSession.objects.create(course=self.course, latitude=17.385, longitude=78.4867)
+        self.enrolled = User.objects.create_user('enrolled', role='STUDENT', department='AIML')
+        self.other = User.objects.create_user('other', role='STUDENT')
+        self.course.students.add(self.enrolled)
+        self.client.force_login(self.faculty)
+
+    def post_frame(self, matches, scope='campus'):
+        boxes = [(10, 50, 50, 10)] * len(matches)
+        with mock.patch('core.views.compute_face_encodings', return_value=(boxes, [np.zeros(128)] * len(matches))) \
+                as encode, mock.patch('core.views.identify_campus', return_value=matches), \
+                mock.patch('core.views.get_campus_index', return_value=[]):
+            response = self.client.post(reverse('kiosk-attendance'), {
+                'session': self.session.pk, 'scope': scope,
+                'frame': SimpleUploadedFile('f.jpg', jpeg_bytes((64, 64)), 'image/jpeg'),
+            })
+        self.assertEqual(encode.call_args.kwargs['detect_side'], 1600)
+        return response
+
+    def test_only_enrolled_students_are_marked(self):
+        response = self.post_frame([
+            (self.enrolled.pk, 0.2), (self.other.pk, 0.3), (self.faculty.pk, 0.3), (999999, 0.1),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['marked'], 1)
+        self.assertEqual([face['student'] for face in response.json()['faces']], ['enrolled', None, None, None])
+        self.assertEqual(list(AttendanceRecord.objects.values_list('student__username', flat=True)), ['enrolled'])
+        self.assertEqual(DailyAttendance.objects.get().present, 1)
+
+    @override_settings(KIOSK_REQUIRE_ENROLLMENT=False)
+    def test_campus_scope_can_mark_any_student(self):
+        response = self.post_frame([(self.other.pk, 0.3), (self.faculty.pk, 0.3)])
+        self.assertEqual(response.json()['marked'], 1)
+        self.assertTrue(AttendanceRecord.objects.filter(student=self.other).exists())
+
+    def test_bad_session_id(self):
+        frame = SimpleUploadedFile('f.jpg', jpeg_bytes((64, 64)), 'image/jpeg')
+        response = self.client.post(reverse('kiosk-attendance'), {'session': 'abc', 'frame': frame})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('kiosk-attendance'), {'session': 999999, 'frame': frame})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(KIOSK_REQUIRE_ENROLLMENT=False)
+    def test_student_checked_in_meanwhile_is_not_counted(self):
+        insert = views.insert_kiosk_records
+
+        def self_check_in_first(session, student_ids):
+            AttendanceRecord.objects.create(session=session, student=self.enrolled,
+                                            gps_lat=17.385, gps_long=78.4867, status='PENDING')
+            return insert(session, student_ids)
+
+        with mock.patch('core.views.insert_kiosk_records', side_effect=self_check_in_first):
+            response = self.post_frame([(self.enrolled.pk, 0.2), (self.other.pk, 0.3)])
+        self.assertEqual(response.json()['marked'], 1)
+        self.assertEqual([face['already_marked'] for face in response.json()['faces']], [True, False])
+        self.assertEqual(AttendanceRecord.objects.get(student=self.enrolled).status, 'PENDING')
+        self.assertEqual(DailyAttendance.objects.get().present, 1)
+
+
+class IVFIndexTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.ids = np.arange(1, 61)
+        self.vectors = rng.normal(size=(60, 128)).astype(np.float32)
+        self.index = IVFIndex.train(self.ids, self.vectors, n_lists=4, n_probe=4)
+
+    def test_search_finds_exact_neighbours(self):
+        ids, distances = self.index.search(self.vectors[[5, 17]] + 0.01, k=2)
+        self.assertEqual(ids[:, 0].tolist(), [6, 18])
+        self.assertTrue(np.all(distances[:, 0] <= distances[:, 1]))
+
+    def test_add_replace_and_remove(self):
+        self.index.add(6, self.vectors[40])  # replaced, not duplicated
+        self.assertEqual(len(self.index), 60)
+        ids, _ = self.index.search(self.vectors[40][None, :], k=2)
+        self.assertEqual(sorted(ids[0].tolist()), [6, 41])
+        self.index.remove(41)
+        self.index.remove(999)  # unknown ids are ignored
+        self.assertEqual(len(self.index), 59)
+        self.assertEqual(self.index.search(self.vectors[40][None, :], k=1)[0][0, 0], 6)
+
+    def test_save_and_load_round_trip(self):
+        path = os.path.join(index_dir, 'round_trip.npz')
+        self.index.save(path)
+        loaded = IVFIndex.load(path)
+        self.assertEqual(len(loaded), 60)
+        probes = self.vectors[:10]
+        for a, b in zip(self.index.search(probes, k=3), loaded.search(probes, k=3)):
+            np.testing.assert_allclose(a, b, rtol=1e-6)
+
+
+class CampusIndexTests(TestCase):
+    def setUp(self):
+        for path in (settings.FACE_ANN_INDEX_PATH,):
+            if os.path.exists(path):
+                os.remove(path)
+        self.addCleanup(setattr, ann, '_campus_index', None)
+        self.students = [self.make_user(f'student{i}', 'STUDENT', i) for i in range(3)]
+
+    def make_user(self, username, role, value):
+        user = User.objects.create_user(username, role=role)
+        User.objects.filter(pk=user.pk).update(face_embedding=encode_embedding(np.full(128, float(value))))
+        return user
+
+    def saved_ids(self):
+        return set(IVFIndex.load(settings.FACE_ANN_INDEX_PATH).where)
+
+    def test_only_students_are_indexed(self):
+        faculty = self.make_user('prof', 'FACULTY', 9)
+        update_campus_users([faculty.pk, self.students[0].pk])
+        self.assertEqual(self.saved_ids(), {student.pk for student in self.students})
+
+    def test_updates_from_another_worker_are_not_lost(self):
+        update_campus_users([])
+        stale = ann._campus_index
+        late = self.make_user('late', 'STUDENT', 5)
+        update_campus_users([late.pk])
+        # This worker still holds the copy from before 'late' was added
+        ann._campus_index, ann._campus_mtime = stale, None
+        gone = self.students[0].pk
+        self.students[0].delete()
+        update_campus_users([gone])
+        self.assertEqual(self.saved_ids(), {self.students[1].pk, self.students[2].pk, late.pk})
+
+    def test_rows_are_read_under_the_file_lock(self):
+        update_campus_users([])
+        student = self.students[0]
+        file_lock = ann._file_lock
+
+        @contextmanager
+        def slow_lock(path):
+            # Another worker saves a newer photo while this one waits for the lock
+            User.objects.filter(pk=student.pk).update(face_embedding=encode_embedding(np.full(128, 7.0)))
+            with file_lock(path):
+                yield
+
+        with mock.patch.object(ann, '_file_lock', slow_lock):
+            update_campus_users([student.pk])
+        index = IVFIndex.load(settings.FACE_ANN_INDEX_PATH)
+        vectors = index.list_vectors[index.where[student.pk]]
+        ids = index.list_ids[index.where[student.pk]].tolist()
+        self.assertTrue(np.allclose(vectors[ids.index(student.pk)], 7.0))
+
+    def test_delete_is_scheduled_after_commit(self):
+        with mock.patch.object(ann.campus_updater, 'submit') as submit, \
+                self.captureOnCommitCallbacks(execute=True):
+            pk = self.students[1].pk
+            self.students[1].delete()
+        submit.assert_called_with(pk)
+
+
+class EnrollmentImportTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        if os.path.exists(settings.FACE_ANN_INDEX_PATH):
+            os.remove(settings.FACE_ANN_INDEX_PATH)
+        self.addCleanup(setattr, ann, '_campus_index', None)
+
+        self.photos = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.photos)
+        face = os.path.join(os.path.dirname(__file__), 'yash.jpeg')
+        for username in ('asha', 'bala'):
+            shutil.copy(face, os.path.join(self.photos, f'{username}.jpeg'))
+        with open(os.path.join(self.photos, 'chitra.jpg'), 'wb') as f:
+            f.write(jpeg_bytes((200, 200)))
+        self.csv_path = os.path.join(self.photos, 'students.csv')
+        with open(self.csv_path, 'w') as f:
+            f.write("username,first_name,password\nasha,Asha,secret\nbala,Bala,\nchitra,Chitra,\ndev,Dev,\n")
+        self.course = Course.objects.create(name='Machine Learning', faculty=User.objects.create_user('prof', role='FACULTY'))
+
+    def enroll(self, **kwargs):
+        rows = read_roster_csv(self.csv_path, self.photos)
+        return enroll_students(rows, course=self.course, workers=1, chunk_size=2, **kwargs)
+
+    def saved_ids(self):
+        return set(IVFIndex.load(settings.FACE_ANN_INDEX_PATH).where)
+
+    def test_imports_and_resumes(self):
+        result = self.enroll()
+        self.assertEqual((result.created, result.skipped), (2, 0))
+        self.assertEqual(sorted((username, reason) for username, _, reason in result.failures),
+                         [('chitra', 'no face found'), ('dev', 'photo not found')])
+        asha = User.objects.get(username='asha')
+        self.assertTrue(asha.check_password('secret'))
+        self.assertEqual((asha.role, asha.face_embedding_engine), ('STUDENT', get_engine().name))
+        self.assertEqual(set(self.course.students.values_list('username', flat=True)), {'asha', 'bala'})
+        self.assertEqual(self.saved_ids(), set(self.course.students.values_list('id', flat=True)))
+
+        # An interrupted import: 'bala' never made it in; the rerun only adds them
+        User.objects.filter(username='bala').delete()
+        result = self.enroll()
+        self.assertEqual((result.created, result.skipped, len(result.failures)), (1, 1, 2))
+        self.assertEqual(set(self.course.students.values_list('username', flat=True)), {'asha', 'bala'})
+        self.assertIn(User.objects.get(username='bala').pk, self.saved_ids())
+
+    def test_username_taken_meanwhile_is_not_counted(self):
+        store_photo = enrollment.store_photo
+
+        def sign_up_first(row):
+            if row.username == 'bala':
+                User.objects.create_user('bala', role='FACULTY')
+            return store_photo(row)
+
+        with mock.patch.object(enrollment, 'store_photo', side_effect=sign_up_first):
+            result = self.enroll()
+        self.assertEqual(result.created, 1)
+        self.assertIn(('bala', os.path.join(self.photos, 'bala.jpeg'), 'username already taken'), result.failures)
+        self.assertEqual(list(self.course.students.values_list('username', flat=True)), ['asha'])
+        self.assertEqual(self.saved_ids(), {User.objects.get(username='asha').pk})
+
+
+class SQLitePragmaTests(TestCase):
+    def journal_mode(self, path):
+        connection = DatabaseWrapper({**settings.DATABASES['default'], 'NAME': path})
+        connection.ensure_connection()
+        self.addCleanup(connection.close)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            return cursor.fetchone()[0]
+
+    def test_journal_mode_is_left_alone_by_default(self):
+        scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch)
+        self.assertNotIn('journal_mode', settings.SQLITE_PRAGMAS)
+        self.assertEqual(self.journal_mode(os.path.join(scratch, 'dev.sqlite3')), 'delete')
+        with self.settings(SQLITE_PRAGMAS={**settings.SQLITE_PRAGMAS, **settings.SQLITE_WAL_PRAGMAS}):
+            self.assertEqual(self.journal_mode(os.path.join(scratch, 'deployed.sqlite3')), 'wal')
@@ -0,0 +1,190 @@
+# core/thumbnails.py
+"""
+Small thumbnails for profile photos and check-in captures, and the
+retention job that retires full-size captures.
+
+Pages and JSON endpoints link to the thumbnails (a few KB each) instead of
+the originals. compact_media() backfills missing thumbnails on a thread pool
+(Pillow releases the GIL while decoding and resizing), chunk by chunk so
+only `chunk_size` rows and `workers` images are in memory at once. It then
+archives or drops captures older than CAPTURE_RETENTION_DAYS.
+"""
+import io
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import AttendanceRecord, User
+from .response_cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+
+def make_thumbnail(source, size=None):
+    """Decode `source` (path or file object) at reduced size -> ContentFile (WebP, or JPEG)."""
+    size = size or settings.THUMBNAIL_SIZE
+    image = Image.open(source)
+    image.draft('RGB', (size, size))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    image.thumbnail((size, size))
+
+    image_format = settings.THUMBNAIL_FORMAT
+    if image_format == 'WEBP' and not features.check('webp'):
+        image_format = 'JPEG'
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=settings.THUMBNAIL_QUALITY)
+    return ContentFile(buffer.getvalue(), name=f"thumb.{image_format.lower()}")
+
+
+def save_thumbnail(field, source):
+    """Store a thumbnail of `source` in field's upload_to directory; returns the storage name."""
+    content = make_thumbnail(source)
+    return default_storage.save(os.path.join(field.upload_to, content.name), content)
+
+
+def capture_thumbnail(source):
+    """Thumbnail for a new check-in capture; '' if it can't be made (compact_media retries)."""
+    try:
+        return save_thumbnail(AttendanceRecord._meta.get_field('captured_thumbnail'), source)
+    except Exception as e:
+        logger.warning("Could not make a capture thumbnail: %s", e)
+        return ''
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+
+def thumbnail_url(thumbnail, original):
+    """URL of the thumbnail, or of the original while no thumbnail exists yet."""
+    if thumbnail:
+        return thumbnail.url
+    return original.url if original else None
+
+
+def refresh_profile_thumbnail(user):
+    """Regenerate the profile thumbnail after the photo changed (queryset update, no signals)."""
+    name = ''
+    if user.profile_image:
+        try:
+            with user.profile_image.open('rb') as f:
+                name = save_thumbnail(User._meta.get_field('profile_thumbnail'), f)
+        except Exception as e:
+            logger.warning("Could not make a thumbnail for %s: %s", user.username, e)
+    user.profile_thumbnail = name
+    User.objects.filter(pk=user.pk).update(profile_thumbnail=name)
+
+
+@dataclass
+class CompactionResult:
+    profile_thumbnails: int = 0
+    capture_thumbnails: int = 0
+    failed: int = 0
+    expired: int = 0
+    archived_bytes: int = 0
+
+
+def _chunks(rows, chunk_size):
+    """
+    (pk, ...) rows in pk order, one chunk per query (keyset pagination), so
+    rows can be updated between chunks and memory stays at one chunk.
+    """
+    last = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1][0]
+
+
+def _thumbnail_task(field, name):
+    try:
+        with default_storage.open(name, 'rb') as f:
+            return save_thumbnail(field, f)
+    except Exception as e:
+        logger.warning("Could not make a thumbnail of %s: %s", name, e)
+        return None
+
+
+def backfill_thumbnails(model, source_field, thumbnail_field, pool, chunk_size):
+    """Thumbnails for every row that has a source image but no thumbnail. Returns (made, failed)."""
+    field = model._meta.get_field(thumbnail_field)
+    rows = (
+        model.objects.exclude(**{source_field: ''}).exclude(**{f'{source_field}__isnull': True})
+        .filter(**{thumbnail_field: ''})
+        .order_by('pk')
+        .values_list('pk', source_field)
+    )
+    made = failed = 0
+    for chunk in _chunks(rows, chunk_size):
+        names = pool.map(lambda row: _thumbnail_task(field, row[1]), chunk)
+        updates = [model(pk=pk, **{thumbnail_field: name}) for (pk, _), name in zip(chunk, names) if name]
+        with transaction.atomic():
+            model.objects.bulk_update(updates, [thumbnail_field])
+        if model is User:
+            for user in updates:
+                invalidate('current_user', user.pk)
+        made += len(updates)
+        failed += len(chunk) - len(updates)
+    return made, failed
+
+
+def archive_file(name):
+    """Copy a media file into CAPTURE_ARCHIVE_ROOT under the same relative name; returns its size."""
+    target = os.path.join(settings.CAPTURE_ARCHIVE_ROOT, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with default_storage.open(name, 'rb') as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    return os.path.getsize(target)
+
+
+def expire_captures(days, action, chunk_size):
+    """
+    Retire the full-size capture of records older than `days` that already
+    have a thumbnail: 'archive' copies it to CAPTURE_ARCHIVE_ROOT first,
+    'delete' just drops it. The field is cleared; gc_media frees the file.
+    Returns (records, archived bytes).
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    rows = (
+        AttendanceRecord.objects.filter(timestamp__lt=cutoff)
+        .exclude(captured_image='').exclude(captured_image__isnull=True)
+        .exclude(captured_thumbnail='')
+        .order_by('pk')
+        .values_list('pk', 'captured_image')
+    )
+    expired = archived = 0
+    for chunk in _chunks(rows, chunk_size):
+        if action == 'archive':
+            for _, name in chunk:
+                try:
+                    archived += archive_file(name)
+                except FileNotFoundError:
+                    pass  # already gone: nothing to keep
+        AttendanceRecord.objects.filter(pk__in=[pk for pk, _ in chunk]).update(captured_image='')
+        expired += len(chunk)
+    return expired, archived
+
+
+def compact_media(retention_days=None, action=None, workers=4, chunk_size=200):
+    retention_days = settings.CAPTURE_RETENTION_DAYS if retention_days is None else retention_days
+    action = action or settings.CAPTURE_RETENTION_ACTION
+    result = CompactionResult()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        made, failed = backfill_thumbnails(User, 'profile_image', 'profile_thumbnail', pool, chunk_size)
+        result.profile_thumbnails, result.failed = made, failed
+        made, failed = backfill_thumbnails(AttendanceRecord, 'captured_image', 'captured_thumbnail', pool, chunk_size)
+        result.capture_thumbnails, result.failed = made, result.failed + failed
+    if retention_days is not None:
+        result.expired, result.archived_bytes = expire_captures(retention_days, action, chunk_size)
+    return result
@@ -1,38 +1,171 @@
 # core/utils.py
-import face_recognition
-from geopy.distance import geodesic
+import io
+import logging
 
-# Location check remains same...
+import numpy as np
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from . import geofence
+from .face_engine import get_engine
+from .metrics import timed
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_SIZE = 128  # every face engine produces 128-d vectors
+
+# Max face distance that still counts as the same person: each engine has its
+# own scale (see core/face_engine.py)
+def match_threshold():
+    return get_engine().threshold
+
+# Location check: bounding-box reject + local planar distance (see core/geofence.py)
 def is_within_radius(student_loc, college_loc, radius_meters):
-    distance = geodesic(student_loc, college_loc).meters
-    return distance <= radius_meters
+    return geofence.within_radius(student_loc, college_loc, radius_meters)
+
+# PREPROCESSING: phone cameras upload 4000x3000 JPEGs. Decode them at reduced
+# size (JPEG draft mode), fix EXIF rotation and shrink to FACE_IMAGE_MAX_SIDE
+# before any face work happens.
+def prepare_face_image(source, max_side=None):
+    max_side = max_side or settings.FACE_IMAGE_MAX_SIDE
+    with timed('stage', stage='decode'):
+        image = Image.open(source)
+        # JPEG only: let libjpeg decode at 1/2, 1/4 or 1/8 scale (>= max_side)
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+        image.thumbnail((max_side, max_side))
+        return np.array(image)
+
+# Decode an uploaded image (InMemoryUploadedFile / TemporaryUploadedFile) straight
+# into an RGB numpy array, without writing it to MEDIA_ROOT first
+def load_image_from_upload(uploaded_file, max_side=None):
+    try:
+        uploaded_file.seek(0)
+        image = prepare_face_image(uploaded_file, max_side)
+        uploaded_file.seek(0)  # rewind so the file can still be saved later
+        return image
+    except Exception as e:
+        logger.warning("Could not decode upload: %s", e)
+        return None
+
+# Decode raw image bytes into an RGB numpy array
+def load_image_from_bytes(image_bytes):
+    try:
+        return prepare_face_image(io.BytesIO(image_bytes))
+    except Exception as e:
+        logger.warning("Could not decode image: %s", e)
+        return None
+
+# Find faces on a small copy (grayscale for HOG, which only needs luminance),
+# then map the boxes back to the RGB image's coordinates
+def detect_faces(image, detect_side=None, engine=None):
+    engine = engine or get_engine()
+    detect_side = detect_side or settings.FACE_DETECT_MAX_SIDE
+    height, width = image.shape[:2]
+    scale = min(1.0, detect_side / max(height, width))
+
+    small = Image.fromarray(image).convert(engine.detect_mode)
+    if scale < 1.0:
+        small = small.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR)
+
+    with timed('stage', stage='detect'):
+        locations = engine.detect(np.array(small))
+    return [
+        (
+            max(0, int(top / scale)),
+            min(width, int(right / scale)),
+            min(height, int(bottom / scale)),
+            max(0, int(left / scale)),
+        )
+        for top, right, bottom, left in locations
+    ]
+
+# Turn an image (numpy array, path or file object) into a 128-d face encoding
+def compute_face_encoding(image_file, engine=None):
+    engine = engine or get_engine()
+    try:
+        if isinstance(image_file, np.ndarray):
+            image = image_file
+        else:
+            image = prepare_face_image(image_file)
+
+        locations = detect_faces(image, engine=engine)
+        if len(locations) == 0:
+            return None
+
+        with timed('stage', stage='encode'):
+            return engine.embed(image, locations[:1])[0]
+
+    except Exception:
+        logger.exception("Face check failed")
+        return None
+
+# Every face in one frame (kiosk mode): returns (locations, encodings)
+def compute_face_encodings(image, engine=None, detect_side=None):
+    engine = engine or get_engine()
+    try:
+        locations = detect_faces(image, detect_side, engine=engine)
+        if len(locations) == 0:
+            return [], []
+        with timed('stage', stage='encode'):
+            return locations, engine.embed(image, locations)
+
+    except Exception:
+        logger.exception("Face check failed")
+        return [], []
 
 # UPDATED FACE CHECKER
-def check_face_match(reference_image_path, captured_image_file):
+def check_face_match(known_encoding, captured_image_file):
     try:
-        # 1. Load Reference (From Disk - The Saved Scan)
-        known_image = face_recognition.load_image_file(reference_image_path)
-        known_encodings = face_recognition.face_encodings(known_image)
-        
-        if len(known_encodings) == 0:
-            return False 
-        
-        known_encoding = known_encodings[0]
-
-        # 2. Load Captured (From Memory - The Live Upload)
-        # We can pass the file object directly!
-        unknown_image = face_recognition.load_image_file(captured_image_file)
-        unknown_encodings = face_recognition.face_encodings(unknown_image)
-
-        if len(unknown_encodings) == 0:
+        # 1. Reference comes pre-computed (stored on the User at upload time)
+        if known_encoding is None:
+            return False
+
+        # 2. Captured image arrives already decoded (From Memory - The Live Upload)
+        unknown_encoding = compute_face_encoding(captured_image_file)
+
+        if unknown_encoding is None:
             return False
 
         # 3. Compare
-        distance = face_recognition.face_distance([known_encoding], unknown_encodings[0])[0]
-        
-        # 0.5 is the strictness threshold
-        return distance < 0.5
+        with timed('stage', stage='distance'):
+            distance = get_engine().compare([known_encoding], unknown_encoding)[0]
 
-    except Exception as e:
-        print(f"❌ AI Error: {e}")
-        return False
\ No newline at end of file
+        # Below the threshold = same person
+        return distance < match_threshold()
+
+    except Exception:
+        logger.exception("Face check failed")
+        return False
+
+
+# Entry point for the verification worker processes: plain bytes + vector in,
+# bool out, so nothing Django-related has to cross the process boundary.
+def verify_capture_bytes(image_bytes, known_encoding):
+    captured_image = load_image_from_bytes(image_bytes)
+    if captured_image is None:
+        return False
+    return check_face_match(known_encoding, captured_image)
+
+
+# Batched version for the micro-batching verifier: encode every capture in the
+# batch, then compare all of them against their references in one NumPy op.
+def verify_capture_batch(image_bytes_list, known_encodings):
+    probes = np.full((len(image_bytes_list), EMBEDDING_SIZE), np.nan)
+    for i, image_bytes in enumerate(image_bytes_list):
+        captured_image = load_image_from_bytes(image_bytes)
+        if captured_image is None:
+            continue
+        encoding = compute_face_encoding(captured_image)
+        if encoding is not None:
+            probes[i] = encoding
+
+    with timed('stage', stage='distance'):
+        distances = pairwise_face_distance(probes, np.asarray(known_encodings, dtype=np.float64))
+    # NaN (no face / unreadable image) compares False
+    return (distances < match_threshold()).tolist()
+
+# Row-wise euclidean distance between two (N, 128) matrices
+def pairwise_face_distance(probes, references):
+    return np.sqrt(np.einsum('ij,ij->i', probes - references, probes - references))
@@ -0,0 +1,287 @@
+# core/verification.py
+"""
+Background face verification.
+
+MarkAttendanceView stores a PENDING AttendanceRecord and hands the selfie to a
+local process pool, in micro-batches (see BatchVerifier). When the worker
+answers, the record becomes PRESENT (and the selfie is saved) or REJECTED.
+No external broker is needed: the pending rows themselves are the queue's
+durable state. The selfies only live in this process's memory, so a PENDING
+row older than FACE_VERIFICATION_PENDING_TIMEOUT belongs to a job that was
+lost (worker restart or crash); reap_stale_checkins() rejects those rows so
+the student can check in again.
+"""
+import io
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .face_engine import warm_up
+from .metrics import capture_timings, record_samples, timed
+from .models import AttendanceRecord
+from .rollups import count_present, record_day
+from .thumbnails import capture_thumbnail
+from .utils import verify_capture_batch
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_reaper = None
+
+
+def get_executor():
+    """The process pool, created on first use in each web worker."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Each pool process loads the face backend before its first batch
+            _executor = ProcessPoolExecutor(max_workers=settings.FACE_VERIFICATION_WORKERS, initializer=warm_up)
+            start_reaper()
+        return _executor
+
+
+def reset_executor(broken):
+    """
+    Drop a pool that is in BrokenProcessPool (one of its processes died), so
+    the next batch starts a fresh one instead of failing forever.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def reap_stale_checkins(**filters):
+    """
+    Reject PENDING records older than FACE_VERIFICATION_PENDING_TIMEOUT: their
+    job died with the process that queued it. Returns the number of rows.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.FACE_VERIFICATION_PENDING_TIMEOUT)
+    stale = AttendanceRecord.objects.filter(status='PENDING', timestamp__lt=cutoff, **filters)
+    # Check first: an UPDATE takes the SQLite write lock even when nothing matches
+    if not stale.exists():
+        return 0
+    count = stale.update(status='REJECTED')
+    logger.warning("Rejected %d check-ins whose face verification was lost", count)
+    return count
+
+
+def _reap_forever():
+    while True:
+        time.sleep(settings.FACE_VERIFICATION_REAP_INTERVAL)
+        try:
+            reap_stale_checkins()
+        except Exception:
+            logger.exception("Could not reap stale check-ins")
+        finally:
+            close_old_connections()
+
+
+def start_reaper():
+    """Reap once now (rows left by a previous process), then on a timer."""
+    global _reaper
+    if _reaper is not None:
+        return
+    try:
+        reap_stale_checkins()
+    except Exception:
+        logger.exception("Could not reap stale check-ins")
+    _reaper = threading.Thread(target=_reap_forever, name='face-checkin-reaper', daemon=True)
+    _reaper.start()
+
+
+class BatchVerifier:
+    """
+    Collects queued check-ins for up to `window` seconds (or `batch_size` jobs)
+    and spreads them over the `workers` pool processes as one sub-batch each:
+    decoding and encoding run in parallel, and each sub-batch's distances are
+    still computed in a single matrix operation.
+    """
+
+    def __init__(self, batch_size, window, workers=1):
+        self.batch_size = batch_size
+        self.window = window
+        self.workers = max(1, workers)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.jobs = 0
+
+    def submit(self, job):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='face-batch-verifier', daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.batches += 1
+            self.jobs += len(batch)
+            try:
+                for part in self.split(batch):
+                    try:
+                        self.dispatch(part)
+                    except Exception as e:
+                        logger.error("Could not queue face verification batch: %s", e)
+                        finalize_batch(part, [False] * len(part))
+            finally:
+                close_old_connections()
+
+    def split(self, batch):
+        """At most one sub-batch per pool process, as even as possible."""
+        size = -(-len(batch) // self.workers)
+        return [batch[i:i + size] for i in range(0, len(batch), size)]
+
+    def dispatch(self, batch):
+        for attempt in range(2):
+            executor = get_executor()
+            try:
+                # capture_timings brings the worker's decode/detect/encode timings back
+                future = executor.submit(
+                    capture_timings,
+                    verify_capture_batch,
+                    [job.image_bytes for job in batch],
+                    [job.known_encoding for job in batch],
+                )
+            except BrokenProcessPool:
+                reset_executor(executor)
+                if attempt:
+                    raise
+                continue
+            future.add_done_callback(lambda f, batch=batch: finish_batch(batch, f, executor))
+            return
+
+
+class VerificationJob:
+    def __init__(self, record_id, image_name, image_bytes, known_encoding):
+        self.record_id = record_id
+        self.image_name = image_name
+        self.image_bytes = image_bytes
+        self.known_encoding = known_encoding
+
+
+_batcher = None
+
+
+def get_batcher():
+    global _batcher
+    with _executor_lock:
+        if _batcher is None:
+            _batcher = BatchVerifier(
+                batch_size=settings.FACE_VERIFICATION_BATCH_SIZE,
+                window=settings.FACE_VERIFICATION_BATCH_WINDOW_MS / 1000,
+                workers=settings.FACE_VERIFICATION_WORKERS,
+            )
+        return _batcher
+
+
+def submit_verification(record, image_bytes, image_name, known_encoding):
+    """Queue the face check for a PENDING record. Returns immediately."""
+    get_batcher().submit(VerificationJob(record.pk, image_name, image_bytes, known_encoding))
+
+
+def finish_batch(batch, future, executor=None):
+    """Done-callback for one batch: write every verdict back."""
+    try:
+        try:
+            results, samples = future.result()
+            record_samples(samples)
+        except Exception as e:
+            logger.error("Face verification batch failed: %s", e)
+            if isinstance(e, BrokenProcessPool) and executor is not None:
+                reset_executor(executor)
+            results = [False] * len(batch)
+        finalize_batch(batch, results)
+    finally:
+        # Callbacks run on the pool's own thread, which Django does not manage
+        close_old_connections()
+
+
+def finalize_batch(batch, results):
+    """
+    Write a whole batch of verdicts back to their PENDING records in one
+    transaction, so a burst of check-ins costs one SQLite write lock per
+    batch instead of one per student.
+    """
+    verdicts = {job.record_id: (job, is_match) for job, is_match in zip(batch, results)}
+    records = list(
+        AttendanceRecord.objects.select_related('session', 'student')
+        .filter(pk__in=verdicts, status='PENDING')
+    )
+    if not records:
+        return
+
+    # Selfies go to storage first, outside the write transaction
+    for record in records:
+        job, is_match = verdicts[record.pk]
+        if is_match:
+            record.captured_image.save(job.image_name, ContentFile(job.image_bytes), save=False)
+            record.captured_thumbnail = capture_thumbnail(io.BytesIO(job.image_bytes))
+            record.status = 'PRESENT'
+        else:
+            record.status = 'REJECTED'
+
+    with timed('stage', stage='db_write'), transaction.atomic():
+        # Re-check inside the write transaction: the reaper may have rejected
+        # a row since it was read (and the student checked in again)
+        pending = set(
+            AttendanceRecord.objects.filter(pk__in=[record.pk for record in records], status='PENDING')
+            .values_list('pk', flat=True)
+        )
+        records = [record for record in records if record.pk in pending]
+        try:
+            with transaction.atomic():
+                AttendanceRecord.objects.bulk_update(records, ['captured_image', 'captured_thumbnail', 'status'])
+        except IntegrityError:
+            # One conflicting row must not cost the rest of the batch its verdicts
+            records = [record for record in records if _finalize_one(record)]
+
+        # Counted on the day of the check-in, even if verified after midnight
+        present_by_day = {}
+        for record in records:
+            if record.status == 'PRESENT':
+                key = (record.session_id, record_day(record))
+                present_by_day.setdefault(key, (record.session, []))[1].append(record.student.department)
+        for (_, day), (session, departments) in present_by_day.items():
+            count_present(session, departments, day=day)
+
+
+def _finalize_one(record):
+    """Write one verdict in its own savepoint; False if the row could not take it."""
+    try:
+        with transaction.atomic():
+            return AttendanceRecord.objects.filter(pk=record.pk, status='PENDING').update(
+                captured_image=record.captured_image.name or None,
+                captured_thumbnail=record.captured_thumbnail.name or '',
+                status=record.status,
+            ) == 1
+    except IntegrityError:
+        logger.warning("Could not finalize check-in %s as %s", record.pk, record.status)
+        return False
@@ -1,6 +1,6 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import Course,AttendanceSession, AttendanceRecord
+from .models import Building, Course,AttendanceSession, AttendanceRecord, DailyAttendance
 from .serializers import AttendanceSerializer
 from .utils import is_within_radius, check_face_match
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -10,13 +10,16 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import AuthenticationForm
 from django.shortcuts import render, redirect
 from .models import User
-from django.db.models import Count
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
 import base64
+from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import TemplateView
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 class HomeView(TemplateView):
     template_name = 'core/home.html'
 
@@ -24,15 +27,175 @@ from datetime import timedelta # Import this at top
 # ...
 
 # core/views.py
+import logging
+import time
 from datetime import timedelta
 from django.utils import timezone
-from .utils import check_face_match, is_within_radius # Ensure this is imported
+from .utils import check_face_match, compute_face_encodings, is_within_radius, load_image_from_upload # Ensure this is imported
+from .roster import get_course_roster, roster_cache
+from .ann import get_campus_index, identify_campus
+from .rollups import count_present
+from .campus import find_building, inside_building
+from .thumbnails import capture_thumbnail, thumbnail_url
+from . import metrics
+from .metrics import observe, timed
+from .export import export_queryset, iter_csv
+from . import response_cache
+from .response_cache import cached_json
+from .embeddings import get_reference_embedding, reference_cache
+from .verification import get_batcher, reap_stale_checkins, submit_verification
+from django.conf import settings
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_CHECKIN_ERROR = "Attendance already marked for this session."
+
+# ---------------------------------------------------------
+# CHECK-IN PIPELINE
+# Each stage takes the CheckIn and returns an error message (reject)
+# or None (pass). Stages run in order, cheapest first, so the face
+# check only runs once every DB/GPS check has already passed.
+# ---------------------------------------------------------
+class CheckIn:
+    """State shared by the check-in stages for one request."""
+
+    def __init__(self, request, student, session, serializer):
+        self.request = request
+        self.student = student
+        self.session = session
+        self.serializer = serializer
+        self.known_encoding = None
+        self.timings = {}  # stage name -> milliseconds
+
+
+def check_session_active(checkin):
+    # ⏳ Class duration
+    if not checkin.session.is_active:
+        return "Time is up! Class has ended."
+
+
+def release_lost_checkins(checkin):
+    # 🧹 A PENDING row whose face job died with its worker would block the
+    # duplicate and cooldown checks below for good
+    reap_stale_checkins(student=checkin.student)
+
+
+def check_cooldown(checkin):
+    # 🕐 1-hour cooldown since the student's last record
+    last_record = (
+        AttendanceRecord.objects.filter(student=checkin.student)
+        .exclude(status='REJECTED')
+        .order_by('-timestamp')
+        .first()
+    )
+    if last_record:
+        time_since_last = timezone.now() - last_record.timestamp
+        if time_since_last < timedelta(hours=1):
+            wait_time = 60 - int(time_since_last.total_seconds() / 60)
+            return f"You marked attendance recently. Please wait {wait_time} minutes."
+
+
+def check_not_duplicate(checkin):
+    # 🔁 Already marked present (or still being verified) for this session.
+    # Fast path only: the one_checkin_per_session constraint is what actually
+    # stops two concurrent requests (see save_checkin).
+    already = AttendanceRecord.objects.filter(
+        session=checkin.session, student=checkin.student, status__in=['PENDING', 'PRESENT']
+    )
+    if already.exists():
+        return DUPLICATE_CHECKIN_ERROR
+
+
+def check_location(checkin):
+    # 📍 Building outline if the session has one, otherwise the GPS radius
+    data = checkin.serializer.validated_data
+    with timed('stage', stage='geofence'):
+        inside = None
+        if checkin.session.building_id:
+            inside = inside_building(checkin.session.building_id, data['gps_lat'], data['gps_long'])
+        if inside is None:
+            student_loc = (data['gps_lat'], data['gps_long'])
+            college_loc = (checkin.session.latitude, checkin.session.longitude)
+            inside = is_within_radius(student_loc, college_loc, checkin.session.radius_meters)
+    if not inside:
+        return "Out of range"
+
+
+def check_reference(checkin):
+    # 🪪 The stored reference embedding (computed once when the photo was uploaded)
+    if not checkin.student.face_reference:
+        return "No reference image available for this account."
+    checkin.known_encoding = get_reference_embedding(checkin.student)
+    if checkin.known_encoding is None:
+        return "No face found in your reference photo. Please upload a new one."
+
+
+def check_face(checkin):
+    # 👁️ Face recognition (the selfie is decoded in memory; nothing is written to disk yet)
+    captured_image = load_image_from_upload(checkin.serializer.validated_data['captured_image'])
+    if captured_image is None:
+        return "Could not read the captured image."
+
+    if not check_face_match(checkin.known_encoding, captured_image):
+        return "Face not recognized. Keep your face clearly in frame."
+
+
+# Cheapest first: in-memory -> indexed queries -> math -> cached embedding.
+# The face check itself runs last, either inline or on the verification pool.
+CHECKIN_STAGES = [
+    check_session_active,
+    release_lost_checkins,
+    check_cooldown,
+    check_not_duplicate,
+    check_location,
+    check_reference,
+]
+
+
+def save_checkin(serializer, **fields):
+    """
+    Insert the AttendanceRecord. The unique (session, student) constraint
+    rejects a concurrent duplicate; returns None in that case.
+    """
+    record = AttendanceRecord(**{**serializer.validated_data, **fields})
+    try:
+        with timed('stage', stage='db_write'), transaction.atomic():
+            record.save()
+    except IntegrityError:
+        if record.captured_image:
+            record.captured_image.delete(save=False)  # don't leave the selfie behind
+        return None
+    return record
+
+
+def run_checkin_stages(checkin, stages):
+    """Run stages in order, timing each one. Returns the first error, or None."""
+    for stage in stages:
+        started = time.perf_counter()
+        error = stage(checkin)
+        elapsed = time.perf_counter() - started
+        checkin.timings[stage.__name__] = round(elapsed * 1000, 3)
+        observe('stage', elapsed, stage=stage.__name__)
+        if error:
+            logger.info("Check-in rejected at %s: %s %s", stage.__name__, error, checkin.timings)
+            return error
+    logger.info("Check-in passed: %s", checkin.timings)
+    return None
+
 
 @method_decorator(csrf_exempt, name='dispatch')
 class MarkAttendanceView(APIView):
+    stages = CHECKIN_STAGES
+    face_stage = staticmethod(check_face)
+
     def post(self, request):
-        serializer = AttendanceSerializer(data=request.data)
-        if serializer.is_valid():
+        # request.data parses the multipart body lazily, so time it with validation
+        with timed('stage', stage='parse'):
+            serializer = AttendanceSerializer(data=request.data)
+            valid = serializer.is_valid()
+        if valid:
             student = request.user
             session_id = request.data.get('session')
 
@@ -49,99 +212,198 @@ class MarkAttendanceView(APIView):
                     return Response({"error": "Session ID does not exist"}, status=400)
             else:
                 # Fallback: pick first active session
-                for s in AttendanceSession.objects.all():
-                    if s.is_active:
-                        session = s
-                        break
+                session = AttendanceSession.objects.active().first()
                 if not session:
                     return Response({"error": "No active attendance session found"}, status=400)
 
-            # ---------------------------------------------------------
-            # 1. SAVE RECORD TEMPORARILY
-            # (We must save it to disk first so the AI library can read the file path)
-            # ---------------------------------------------------------
-            record = serializer.save(student=student)
-
-            # ---------------------------------------------------------
-            # 2. PRIORITY CHECK: FACE RECOGNITION 👁️
-            # ---------------------------------------------------------
-            # Prefer using the profile image as the persistent reference (uploaded at signup)
-            print("🤖 Starting AI Face Check against profile image...")
-            ref_path = None
-            if student.profile_image:
-                try:
-                    ref_path = student.profile_image.path
-                except Exception:
-                    ref_path = None
+            # 1. RUN THE CHECKS (cheap ones first, face recognition last)
+            checkin = CheckIn(request, student, session, serializer)
+
+            if settings.FACE_VERIFICATION_ASYNC:
+                error = run_checkin_stages(checkin, self.stages)
+                if error:
+                    return Response({"error": error}, status=400)
+
+                # 2a. QUEUE THE FACE CHECK ⏳ -> the client polls the status endpoint
+                upload = serializer.validated_data['captured_image']
+                upload.seek(0)
+                image_bytes = upload.read()
+                record = save_checkin(serializer, student=student, session=session, status="PENDING", captured_image=None)
+                if record is None:
+                    return Response({"error": DUPLICATE_CHECKIN_ERROR}, status=400)
+                submit_verification(record, image_bytes, upload.name, checkin.known_encoding)
+
+                return Response({
+                    "message": "Verifying your face...",
+                    "job_id": record.id,
+                    "status": record.status,
+                    "status_url": reverse('attendance-status', args=[record.id]),
+                }, status=202)
+
+            error = run_checkin_stages(checkin, self.stages + [self.face_stage])
+            if error:
+                return Response({"error": error}, status=400)
+
+            # 2b. SUCCESS: SAVE IMAGE + RECORD IN ONE WRITE ✅
+            thumbnail = capture_thumbnail(serializer.validated_data['captured_image'])
+            if save_checkin(serializer, student=student, session=session, status="PRESENT",
+                            captured_thumbnail=thumbnail) is None:
+                return Response({"error": DUPLICATE_CHECKIN_ERROR}, status=400)
+            with timed('stage', stage='db_write'):
+                count_present(session, [student.department])
+
+            return Response(attendance_marked_payload(session), status=201)
 
-            if not ref_path and student.reference_image:
-                try:
-                    ref_path = student.reference_image.path
-                except Exception:
-                    ref_path = None
-
-            if not ref_path:
-                record.delete()
-                return Response({"error": "No reference image available for this account."}, status=400)
-
-            is_match = check_face_match(ref_path, record.captured_image.path)
-            if not is_match:
-                record.delete()
-                return Response({"error": "Face not recognized. Keep your face clearly in frame."}, status=400)
-
-            # ---------------------------------------------------------
-            # 3. SECOND CHECK: CLASS DURATION ⏳
-            # ---------------------------------------------------------
-            if not session.is_active:
-                record.delete() # ❌ Delete logic
-                return Response({"error": "Time is up! Class has ended."}, status=400)
-
-            # ---------------------------------------------------------
-            # 4. THIRD CHECK: 1-HOUR COOLDOWN 🕐
-            # ---------------------------------------------------------
-            # We verify the *previous* record (excluding the one we just saved)
-            last_record = AttendanceRecord.objects.filter(student=student).exclude(id=record.id).order_by('-timestamp').first()
-            
-            if last_record:
-                time_since_last = timezone.now() - last_record.timestamp
-                if time_since_last < timedelta(hours=1):
-                    wait_time = 60 - int(time_since_last.total_seconds() / 60)
-                    record.delete() # ❌ Delete logic
-                    return Response(
-                        {"error": f"You marked attendance recently. Please wait {wait_time} minutes."}, 
-                        status=400
-                    )
-
-            # ---------------------------------------------------------
-            # 5. FINAL CHECK: LOCATION (GPS) 📍
-            # ---------------------------------------------------------
-            student_loc = (float(request.data.get('gps_lat')), float(request.data.get('gps_long')))
-            college_loc = (session.latitude, session.longitude)
-            # ... inside post method ...
-
-            # ---------------------------------------------------------
-            # 4. FACE CHECK LOGIC (Updated)
-            # ---------------------------------------------------------
-            
-              # Location check
-              if not is_within_radius(student_loc, college_loc, session.radius_meters):
-                  record.delete()
-                  return Response({"error": "Out of range"}, status=400)
-
-            # ---------------------------------------------------------
-            # 6. SUCCESS: FINALIZE RECORD ✅
-            # ---------------------------------------------------------
-            record.status = "PRESENT"
-            record.save()
+        return Response(serializer.errors, status=400)
 
-            return Response({
-                "message": "Attendance Marked!",
-                "class_name": session.course.name,
-                "faculty_name": session.course.faculty.username,
-                "topic": session.topic
-            }, status=201)
 
-        return Response(serializer.errors, status=400)
+def attendance_marked_payload(session):
+    return {
+        "message": "Attendance Marked!",
+        "class_name": session.course.name,
+        "faculty_name": session.course.faculty.username,
+        "topic": session.topic
+    }
+
+
+class AttendanceStatusView(APIView):
+    """
+    Status of a queued check-in: PENDING / PRESENT / REJECTED.
+    Answers at once: holding a worker thread per waiting student is what the
+    queue is there to avoid. While PENDING, Retry-After says when to ask again
+    (clients back off from there).
+    """
+
+    def get(self, request, job_id):
+        status = (AttendanceRecord.objects.filter(pk=job_id, student_id=request.user.pk)
+                  .values_list('status', flat=True).first())
+        if status is None:
+            return Response({"error": "Unknown job id"}, status=404)
+
+        payload = {"job_id": job_id, "status": status}
+        if status == 'PENDING':
+            return Response(payload, headers={'Retry-After': str(settings.FACE_VERIFICATION_POLL_AFTER)})
+        if status == 'PRESENT':
+            session = AttendanceSession.objects.select_related('course__faculty').get(attendancerecord__pk=job_id)
+            payload.update(attendance_marked_payload(session))
+        elif status == 'REJECTED':
+            payload["error"] = "Face not recognized. Keep your face clearly in frame."
+        return Response(payload)
+
+
+def insert_kiosk_records(session, student_ids):
+    """
+    PRESENT records for the given students in one bulk insert. If a student
+    checked in meanwhile (the unique constraint fires), fall back to one
+    savepoint per row. Returns the ids actually inserted, so the rollup only
+    counts those.
+    """
+    records = [
+        AttendanceRecord(session=session, student_id=user_id,
+                         gps_lat=session.latitude, gps_long=session.longitude, status='PRESENT')
+        for user_id in student_ids
+    ]
+    try:
+        with transaction.atomic():
+            AttendanceRecord.objects.bulk_create(records)
+        return set(student_ids)
+    except IntegrityError:
+        pass
+    inserted = set()
+    for record in records:
+        try:
+            with transaction.atomic():
+                record.pk = None
+                record.save(force_insert=True)
+            inserted.add(record.student_id)
+        except IntegrityError:
+            continue
+    return inserted
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class KioskAttendanceView(APIView):
+    """
+    1:N check-in: one classroom camera frame (possibly several faces) is matched
+    against every enrolled student of the session's course (or, with
+    scope=campus, every student on campus via the ANN index), and the matches
+    are marked PRESENT in one bulk insert. Only the course's faculty can post frames.
+    Only STUDENT accounts are marked, and with KIOSK_REQUIRE_ENROLLMENT only the
+    course's enrolled students (the campus index covers everyone).
+    """
+
+    def post(self, request):
+        try:
+            session_id = int(request.data.get('session'))
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid session id"}, status=400)
+        session = (
+            AttendanceSession.objects.select_related('course')
+            .filter(id=session_id, course__faculty_id=request.user.pk)
+            .first()
+        )
+        if session is None:
+            return Response({"error": "Session not found"}, status=404)
+        if not session.is_active:
+            return Response({"error": "Time is up! Class has ended."}, status=400)
+
+        frame = request.FILES.get('frame')
+        # Classroom frames: many small faces, so decode and detect at a larger
+        # size than selfies (HOG misses faces under ~40px)
+        image = load_image_from_upload(frame, settings.FACE_KIOSK_IMAGE_MAX_SIDE) if frame else None
+        if image is None:
+            return Response({"error": "Could not read the camera frame."}, status=400)
+
+        # 1. Every face in the frame -> one (faces, students) distance matrix,
+        #    or an ANN lookup over the whole campus with scope=campus
+        locations, encodings = compute_face_encodings(image, detect_side=settings.FACE_KIOSK_DETECT_MAX_SIDE)
+        if request.data.get('scope') == 'campus':
+            searched = len(get_campus_index())
+            matches = identify_campus(encodings)
+        else:
+            roster = get_course_roster(session.course)
+            searched = len(roster)
+            matches = roster.identify(encodings)
+
+        # 2. Only existing STUDENT accounts (the index can be stale), enrolled in
+        #    the course unless KIOSK_REQUIRE_ENROLLMENT is off
+        eligible = User.objects.filter(
+            id__in={user_id for user_id, _ in matches if user_id is not None}, role='STUDENT'
+        )
+        if settings.KIOSK_REQUIRE_ENROLLMENT:
+            eligible = eligible.filter(enrolled_courses=session.course)
+        students = {
+            user_id: (username, department)
+            for user_id, username, department in eligible.values_list('id', 'username', 'department')
+        }
+        matches = [(user_id, distance) if user_id in students else (None, distance) for user_id, distance in matches]
+
+        # 3. Bulk insert for matched students not already checked in
+        matched_ids = set(students)
+        with transaction.atomic():
+            already = set(
+                AttendanceRecord.objects.filter(
+                    session=session, student_id__in=matched_ids, status__in=['PENDING', 'PRESENT']
+                ).values_list('student_id', flat=True)
+            )
+            marked = insert_kiosk_records(session, matched_ids - already)
+            count_present(session, [students[user_id][1] for user_id in marked])
+        already = matched_ids - marked  # including anyone who checked in meanwhile
+        usernames = {user_id: username for user_id, (username, _) in students.items()}
+        faces = [
+            {
+                "box": {"top": top, "right": right, "bottom": bottom, "left": left},
+                "student": usernames.get(user_id),
+                "distance": None if distance is None else round(distance, 4),
+                "already_marked": user_id in already,
+            }
+            for (top, right, bottom, left), (user_id, distance) in zip(locations, matches)
+        ]
+        return Response({
+            "faces": faces,
+            "marked": len(marked),
+            "searched": searched,
+        }, status=201)
 
 
 # core/views.py
@@ -155,24 +417,38 @@ class FacultyDashboardView(APIView):
         # 1. Check if this Faculty already has an ACTIVE session running
         # We look for a session created by this faculty that is still valid (time-wise)
         faculty_courses = Course.objects.filter(faculty=request.user)
-        active_session = None
-        
-        # Find the first session that hasn't expired
-        for session in AttendanceSession.objects.filter(course__in=faculty_courses):
-            if session.is_active:
-                active_session = session
-                break
+
+        # Find the first session that hasn't expired (filtered in SQL)
+        active_session = AttendanceSession.objects.filter(course__in=faculty_courses).active().first()
         
         context = {}
         
         if active_session:
             # STATE A: Class is Running -> Show the Live Table
-            records = AttendanceRecord.objects.filter(session=active_session).order_by('-timestamp')
+            # One query for the rows (student joined in), capped for huge lectures
+            limit = settings.FACULTY_DASHBOARD_MAX_RECORDS
+            # Before the rows: see pending_checkin_ids()
+            pending = pending_checkin_ids(active_session)
+            records = list(
+                AttendanceRecord.objects.filter(session=active_session, status='PRESENT')
+                .select_related('student')
+                .only('id', 'timestamp', 'status', 'captured_thumbnail', 'student__username')
+                .order_by('-timestamp')[:limit]
+            )
+            student_count = len(records)
+            cursor = max((r.id for r in records), default=0)
+            if student_count == limit:
+                # Only when the list was cut off do we need a real COUNT
+                student_count = AttendanceRecord.objects.filter(session=active_session, status='PRESENT').count()
             context = {
                 'is_active': True,
                 'session': active_session,
                 'records': records,
-                'student_count': records.count()
+                'student_count': student_count,
+                'records_truncated': student_count > len(records),
+                # Where the live feed (/api/live-attendance/) picks up from
+                'cursor': cursor,
+                'pending': sorted(i for i in pending if i <= cursor),
             }
         else:
             # STATE B: No Class -> Show the Start Form
@@ -204,21 +480,108 @@ class FacultyDashboardView(APIView):
 
         # 2. Get Form Data
         duration = int(request.POST.get('duration', 10))
-        # Extra fields (Department, Block, Room) - We accept them but don't save them yet
+        # Extra fields (Department, Block, Room)
         dept = request.POST.get('department') 
         block = request.POST.get('block')
         room = request.POST.get('room_no')
 
+        # The block (within the campus, if sent) picks the building whose outline becomes the geofence
+        try:
+            building = find_building(block, request.POST.get('campus')) if block else None
+        except Building.MultipleObjectsReturned:
+            return render(request, 'core/dashboard.html', {
+                'error': f"Block {block} exists on more than one campus; choose the campus too."
+            })
+        if building:
+            try:
+                building.clean()
+            except ValidationError:
+                return render(request, 'core/dashboard.html', {
+                    'error': f"Block {block} has no usable outline; fix it in the admin first."
+                })
+        latitude, longitude = building.center if building else (17.3850, 78.4867)
+
         # 3. Create Session
         AttendanceSession.objects.create(
             course=course,
             duration_minutes=duration,
-            latitude=17.3850, # Hardcoded for now (or get from request)
-            longitude=78.4867
+            latitude=latitude,
+            longitude=longitude,
+            building=building,
+            room_no=room or '',
         )
         
         return redirect('faculty_dashboard')
 
+def pending_checkin_ids(session, after=0, recheck=()):
+    """
+    PENDING check-ins of the session newer than `after`, plus those of
+    `recheck` still waiting. Query this before the PRESENT rows: a check-in
+    verified in between then shows up in one list or the other, never neither.
+    """
+    return set(
+        AttendanceRecord.objects.filter(session=session, status='PENDING')
+        .filter(Q(id__gt=after) | Q(id__in=recheck))
+        .values_list('id', flat=True)
+    )
+
+
+def live_attendance_api(request):
+    """
+    Incremental live-attendance feed for the faculty dashboard:
+    PRESENT check-ins of ?session=<id> with id greater than ?after=<cursor>,
+    one page at a time. The cursor always moves to the last returned id;
+    check-ins it passed while still PENDING come back in `pending`, and the
+    client sends them as ?recheck=<id,id,...> until they are verified
+    (returned in `records`) or rejected (dropped from `pending`).
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Unauthenticated'}, status=401)
+
+    sessions = AttendanceSession.objects.filter(course__faculty=request.user)
+    session_id = request.GET.get('session')
+    if session_id:
+        try:
+            session = sessions.filter(id=int(session_id)).first()
+        except ValueError:
+            return JsonResponse({'error': 'Invalid session id'}, status=400)
+    else:
+        session = sessions.active().first()
+    if session is None:
+        return JsonResponse({'error': 'Session not found'}, status=404)
+
+    try:
+        after = int(request.GET.get('after', 0))
+        recheck = [int(i) for i in request.GET.get('recheck', '').split(',') if i][:settings.LIVE_FEED_PAGE_SIZE]
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    pending = pending_checkin_ids(session, after, recheck)
+    present = AttendanceRecord.objects.filter(session=session, status='PRESENT')
+    fields = ('id', 'timestamp', 'captured_thumbnail', 'student__username')
+    rows = list(present.filter(id__gt=after).order_by('id').values(*fields)[:settings.LIVE_FEED_PAGE_SIZE])
+    cursor = rows[-1]['id'] if rows else after
+    if recheck:
+        rows += list(present.filter(id__in=recheck, id__lte=after).order_by('id').values(*fields))
+
+    return JsonResponse({
+        'session': session.id,
+        'active': session.is_active,
+        'cursor': cursor,
+        # Passed by the cursor while PENDING (later ones are reached by paging)
+        'pending': sorted(i for i in pending if i <= cursor),
+        'records': [
+            {
+                'id': row['id'],
+                'student': row['student__username'],
+                'time': timezone.localtime(row['timestamp']).strftime('%H:%M:%S'),
+                'thumbnail': default_storage.url(row['captured_thumbnail']) if row['captured_thumbnail'] else None,
+            }
+            for row in rows
+        ],
+    })
+
+
 # core/views.py
 
 class StudentPortalView(LoginRequiredMixin, TemplateView):
@@ -227,16 +590,8 @@ class StudentPortalView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # 1. Find ALL active sessions
-        # Logic: Get all sessions where 'is_active' is True (we check time in Python)
-        active_sessions = []
-        all_sessions = AttendanceSession.objects.all()
-        
-        for session in all_sessions:
-            if session.is_active:
-                active_sessions.append(session)
-        
-        context['active_sessions'] = active_sessions
+        # 1. Find ALL active sessions (end_time is indexed, so this is one SQL query)
+        context['active_sessions'] = AttendanceSession.objects.active().select_related('course')
         return context
 
 
@@ -335,20 +690,31 @@ def logout_view(request):
     return redirect('login')
 from django.http import JsonResponse
 
+@cached_json('home_stats')
 def home_stats_api(request):
-    students = User.objects.filter(role='STUDENT').count()
-    faculty = User.objects.filter(role='FACULTY').count()
-    admins = User.objects.filter(role='ADMIN').count()
+    # Role counts: one grouped query instead of one COUNT per role
+    roles = dict(User.objects.values_list('role').annotate(n=Count('id')).order_by())
+
+    # Attendance: read from the daily rollups, never from AttendanceRecord
+    today = timezone.localdate()
+    days = [today - timedelta(days=i) for i in range(settings.HOME_STATS_DAYS - 1, -1, -1)]
+    rollups = DailyAttendance.objects.filter(date__gte=days[0])
+    per_day = dict(rollups.values_list('date').annotate(total=Sum('present')).order_by())
+    per_department = dict(
+        rollups.values_list('department').annotate(total=Sum('present')).order_by('department')
+    )
 
     return JsonResponse({
-        "students": students,
-        "faculty": faculty,
-        "admins": admins,
-        "days": ["Mon", "Tue", "Wed", "Thu", "Fri"],
-        "attendance": [12, 18, 15, 22, 19]  # dummy for now
+        "students": roles.get('STUDENT', 0),
+        "faculty": roles.get('FACULTY', 0),
+        "admins": roles.get('ADMIN', 0),
+        "days": [day.strftime('%a') for day in days],
+        "attendance": [per_day.get(day, 0) for day in days],
+        "departments": {department or 'Unassigned': total for department, total in per_department.items()},
     })
 
 
+@cached_json('current_user', per_user=True)
 def current_user_api(request):
     """Return minimal JSON for the currently authenticated user."""
     user = request.user
@@ -357,8 +723,8 @@ def current_user_api(request):
 
     profile_url = None
     try:
-        if user.profile_image:
-            profile_url = user.profile_image.url
+        # The thumbnail, not the full-size upload
+        profile_url = thumbnail_url(user.profile_thumbnail, user.profile_image)
     except Exception:
         profile_url = None
 
@@ -369,3 +735,55 @@ def current_user_api(request):
         'email': user.email,
         'profile_image': profile_url
     })
+
+
+
+def cache_stats_api(request):
+    """Hit/miss/eviction counters of this worker's in-process caches and batcher (staff only)."""
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    batcher = get_batcher()
+    return JsonResponse({
+        'reference_embeddings': reference_cache.stats(),
+        'course_rosters': roster_cache.stats(),
+        'json_responses': response_cache.stats(),
+        'verification_batches': {'batches': batcher.batches, 'jobs': batcher.jobs},
+    })
+
+
+def attendance_export_api(request):
+    """
+    Stream attendance records as CSV (staff only). Filters: ?course=<id>,
+    ?from=YYYY-MM-DD, ?to=YYYY-MM-DD, ?department=, ?status=.
+    """
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    filters = {'department': request.GET.get('department'), 'status': request.GET.get('status')}
+    course = request.GET.get('course')
+    if course:
+        if not course.isdigit():
+            return JsonResponse({'error': 'course must be an id'}, status=400)
+        filters['course'] = int(course)
+    for param, key in [('from', 'date_from'), ('to', 'date_to')]:
+        value = request.GET.get(param)
+        if value:
+            try:
+                day = parse_date(value)
+            except ValueError:  # well-formed but impossible, e.g. 2026-02-30
+                day = None
+            if day is None:
+                return JsonResponse({'error': f'{param} must be YYYY-MM-DD'}, status=400)
+            filters[key] = day
+
+    response = StreamingHttpResponse(iter_csv(export_queryset(**filters)), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="attendance.csv"'
+    return response
+
+
+def metrics_api(request):
+    """Latency histograms of this worker in Prometheus text format (staff only)."""
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
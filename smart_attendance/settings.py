@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.LatencyMiddleware',  # first, so it times everything below it
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,9 +80,31 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN: a deferred transaction that later
+            # needs to write can fail with "database is locked" at once,
+            # without waiting for busy_timeout
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Applied to every new SQLite connection (core/signals.py).
+SQLITE_PRAGMAS = {
+    'busy_timeout': 20000,  # ms to wait for the write lock
+    'temp_store': 'MEMORY',
+}
+# WAL lets readers run alongside the single writer; NORMAL syncs at
+# checkpoints, not every commit. The journal mode is stored in the database
+# file itself, so it is opt-in (SQLITE_WAL=1, e.g. in deployment) rather than
+# rewriting the development db.sqlite3 checked into the repo.
+SQLITE_WAL_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+if os.environ.get('SQLITE_WAL') == '1':
+    SQLITE_PRAGMAS.update(SQLITE_WAL_PRAGMAS)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -128,10 +152,104 @@ AUTH_USER_MODEL = 'core.User'
 
 
 
-import os
-
 # Base url to serve media files
 MEDIA_URL = '/media/'
 
 # Path where media is stored
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Uploads are stored by content hash and deduplicated (core/storage.py);
+# run `manage.py gc_media` to remove files nothing references any more
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Thumbnails of profile photos and captures (core/thumbnails.py)
+THUMBNAIL_SIZE = 160  # px, longest side
+THUMBNAIL_FORMAT = 'WEBP'  # falls back to JPEG if Pillow lacks WebP
+THUMBNAIL_QUALITY = 70
+# `manage.py compact_media` retires full-size captures older than this
+# (None keeps them forever): 'archive' copies them to CAPTURE_ARCHIVE_ROOT
+# first, 'delete' does not
+CAPTURE_RETENTION_DAYS = 30
+CAPTURE_RETENTION_ACTION = 'archive'
+CAPTURE_ARCHIVE_ROOT = os.path.join(BASE_DIR, 'archive')
+
+# Face engine (core/face_engine.py): 'dlib' (face_recognition) or 'opencv'
+# (OpenCV DNN, YuNet + SFace ONNX models on CPU). After switching, run
+# `manage.py backfill_face_embeddings` and `manage.py build_face_index`
+FACE_ENGINE = os.environ.get('FACE_ENGINE', 'dlib')
+# OpenCV engine models, from https://github.com/opencv/opencv_zoo
+# (models/face_detection_yunet, models/face_recognition_sface)
+FACE_OPENCV_DETECTOR_MODEL = os.path.join(BASE_DIR, 'models', 'face_detection_yunet_2023mar.onnx')
+FACE_OPENCV_RECOGNIZER_MODEL = os.path.join(BASE_DIR, 'models', 'face_recognition_sface_2021dec.onnx')
+FACE_OPENCV_SCORE_THRESHOLD = 0.8  # min YuNet detection confidence
+
+# Load the face backend when the process starts instead of on first
+# use. Only worth it in processes that verify faces; web workers serving
+# logins, stats or the admin should leave it off
+FACE_ENGINE_WARMUP = os.environ.get('FACE_ENGINE_WARMUP') == '1'
+
+# Per-process cache of decoded face embeddings (~1 KB each)
+FACE_EMBEDDING_CACHE_MAX_ENTRIES = 20000
+FACE_EMBEDDING_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Face checks run on a local process pool; /api/mark-attendance/ answers 202 with
+# a job id and the client polls /api/attendance-status/<id>/, which answers at once
+# (no request thread waits on a verdict) with a Retry-After hint while PENDING
+FACE_VERIFICATION_ASYNC = True
+FACE_VERIFICATION_WORKERS = os.cpu_count() or 2
+FACE_VERIFICATION_POLL_AFTER = 1  # seconds
+# A PENDING check-in older than this lost its job (worker restart/crash) and is
+# rejected by the reaper, which runs when the pool starts and every interval
+FACE_VERIFICATION_PENDING_TIMEOUT = 120  # seconds
+FACE_VERIFICATION_REAP_INTERVAL = 60  # seconds
+# Micro-batching: check-ins arriving within the window are collected, then split
+# into one sub-batch per pool process
+FACE_VERIFICATION_BATCH_SIZE = 16
+FACE_VERIFICATION_BATCH_WINDOW_MS = 50
+
+# Selfies/reference photos are shrunk to this many pixels on the longest side
+# before face work; detection runs on a copy of FACE_DETECT_MAX_SIDE (grayscale for dlib)
+FACE_IMAGE_MAX_SIDE = 800
+FACE_DETECT_MAX_SIDE = 400
+# Kiosk (1:N) frames show a whole classroom: keep faces large enough to detect
+FACE_KIOSK_IMAGE_MAX_SIDE = 1600
+FACE_KIOSK_DETECT_MAX_SIDE = 1600
+# Kiosk check-ins only mark students enrolled in the session's course
+KIOSK_REQUIRE_ENROLLMENT = True
+
+# Kiosk check-in: in-memory roster embedding matrices, one per course
+ROSTER_CACHE_MAX_COURSES = 200
+ROSTER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Campus-wide approximate nearest-neighbour index (core/ann.py)
+FACE_ANN_INDEX_PATH = os.path.join(BASE_DIR, 'face_index.npz')
+FACE_ANN_LISTS = None  # k-means cells; None = sqrt(number of users)
+FACE_ANN_PROBE = 8     # cells scanned per query (higher = better recall, slower)
+
+# Rows shown in the faculty live table (the count above it is always exact)
+FACULTY_DASHBOARD_MAX_RECORDS = 500
+# Max new check-ins per /api/live-attendance/ response
+LIVE_FEED_PAGE_SIZE = 200
+
+# Days of attendance history returned by /api/home-stats/
+HOME_STATS_DAYS = 7
+
+# Response cache for read-mostly JSON endpoints (core/response_cache.py).
+# Local memory is per process; switch to FileBasedCache to share entries
+# (and invalidations) between several workers on one machine.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smart-attendance',
+    }
+}
+RESPONSE_CACHE_TIMEOUT = 60  # seconds
+
+# Geofence: use geopy's geodesic solver instead of the local planar distance
+GEOFENCE_PRECISE = False
+
+# Attendance export: rows fetched per database round trip
+EXPORT_CHUNK_SIZE = 2000
@@ -4,6 +4,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 from core.views import home_stats_api
 from core.views import current_user_api
+from core.views import cache_stats_api
+from core.views import live_attendance_api
+from core.views import attendance_export_api
+from core.views import metrics_api
 
 from core.views import (
     HomeView,              # <--- New
@@ -13,6 +17,8 @@ from core.views import (
     signup_view, 
     logout_view, 
     MarkAttendanceView,
+    AttendanceStatusView,
+    KioskAttendanceView,
     login_redirect_view    # <--- New
 )
 urlpatterns = [
@@ -32,8 +38,14 @@ urlpatterns = [
     # 4. Admin & API
     path('admin/', admin.site.urls),
     path('api/mark-attendance/', MarkAttendanceView.as_view(), name='mark-attendance'),
+    path('api/attendance-status/<int:job_id>/', AttendanceStatusView.as_view(), name='attendance-status'),
+    path('api/kiosk-attendance/', KioskAttendanceView.as_view(), name='kiosk-attendance'),
     path('api/home-stats/', home_stats_api, name='home-stats'),
     path('api/current-user/', current_user_api, name='current-user'),
+    path('api/cache-stats/', cache_stats_api, name='cache-stats'),
+    path('api/live-attendance/', live_attendance_api, name='live-attendance'),
+    path('api/attendance-export/', attendance_export_api, name='attendance-export'),
+    path('metrics/', metrics_api, name='metrics'),
 ]
 
 if settings.DEBUG: